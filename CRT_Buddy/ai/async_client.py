@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, AsyncIterator, Awaitable, List, Optional
+
+import httpx
+
+try:
+    from .cache import ResponseCache
+    from .client import (AIConfig, APIRequest, STREAM_DONE, cache_lookup, cache_store, chat_request,
+                         http_error, image_request, no_key_error, parse_reply, stream_delta, stream_event)
+    from .resilience import AIError, AIResult, Resilience
+except ImportError:
+    from cache import ResponseCache
+    from client import (AIConfig, APIRequest, STREAM_DONE, cache_lookup, cache_store, chat_request,
+                        http_error, image_request, no_key_error, parse_reply, stream_delta, stream_event)
+    from resilience import AIError, AIResult, Resilience
+
+
+class AsyncAIClient:
+    """asyncio counterpart of AIClient for many concurrent calls.
+
+    All requests share one pooled httpx.AsyncClient, and at most
+    max_concurrency of them are in flight at once; the rest wait on a
+    semaphore (which is not held during retry backoff). Results match
+    AIClient: text, image bytes or None, with the same on-disk
+    ResponseCache, retries and circuit breaker. Concurrent callers that
+    need the failure reason should use execute(), since last_error is
+    only the most recent one.
+
+    The HTTP client and semaphore bind to the event loop of the first
+    call, so use one client per loop (see AsyncLoopThread).
+    """
+
+    def __init__(self, config: Optional[AIConfig] = None, max_concurrency: Optional[int] = None,
+                 resilience: Optional[Resilience] = None):
+        self.config = config or AIConfig()
+        self.max_concurrency = max_concurrency or self.config.pool_size
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.cache = ResponseCache.from_config(self.config)
+        self.resilience = resilience or Resilience.from_config(self.config)
+        self.last_error: Optional[AIError] = None
+        if not self.config.api_key:
+            print("[AI] Warning: No API key set. Set OPENAI_API_KEY or AI_API_KEY.")
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                timeout=httpx.Timeout(self.config.read_timeout, connect=self.config.connect_timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+
+    async def aclose(self):
+        """Close pooled connections and the response cache."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._semaphore = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    async def __aenter__(self) -> "AsyncAIClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    # --------- Chat Completion ---------
+    async def chat(self, messages: List[dict], model: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 512) -> Optional[str]:
+        request = chat_request(self.config, messages, model, temperature, max_tokens)
+        return self._finish(await self.execute(request, self.config.read_timeout))
+
+    async def chat_stream(self, messages: List[dict], model: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 512) -> AsyncIterator[str]:
+        """Yield the reply as it is generated; same contract as AIClient.chat_stream."""
+        request = chat_request(self.config, messages, model, temperature, max_tokens, stream=True)
+        if request is None:
+            self.last_error = no_key_error()
+            return
+        http = self._client()
+        result = await self.resilience.acall(request.endpoint, lambda: self._open_stream(http, request))
+        self.last_error = result.error
+        if not result.ok:
+            return
+        resp = result.value
+        try:
+            async for line in resp.aiter_lines():
+                event = stream_event(line)
+                if event == STREAM_DONE:
+                    break
+                if event is not None:
+                    delta = stream_delta(event)
+                    if delta:
+                        yield delta
+        except httpx.HTTPError as e:
+            self.last_error = _httpx_error(e)
+        except ValueError as e:
+            self.last_error = AIError("bad_response", f"Malformed stream event: {e}")
+        finally:
+            await resp.aclose()
+            self._semaphore.release()
+
+    async def _open_stream(self, http: httpx.AsyncClient, request: APIRequest) -> httpx.Response:
+        """Open a streamed response; on success the caller owns it and a semaphore slot."""
+        await self._semaphore.acquire()
+        try:
+            resp = await http.send(http.build_request("POST", request.url, headers=request.headers,
+                                                      json=request.payload), stream=True)
+        except BaseException as e:
+            # Includes cancellation: the slot must not leak
+            self._semaphore.release()
+            if isinstance(e, httpx.HTTPError):
+                raise _httpx_error(e)
+            raise
+        if resp.status_code >= 400:
+            try:
+                body = (await resp.aread()).decode("utf-8", "replace")
+            finally:
+                await resp.aclose()
+                self._semaphore.release()
+            raise http_error(resp.status_code, resp.headers.get("Retry-After"), body)
+        return resp
+
+    # --------- Image Generation ---------
+    async def generate_image(self, prompt: str, model: Optional[str] = None, size: str = "1024x1024",
+                             seed: Optional[int] = None) -> Optional[bytes]:
+        request = image_request(self.config, prompt, model, size, seed)
+        return self._finish(await self.execute(request, self.config.image_read_timeout))
+
+    # --------- Execution ---------
+    async def execute(self, request: Optional[APIRequest], read_timeout: Optional[float] = None) -> AIResult:
+        """Send a request built by chat_request()/image_request(), with cache, retries
+        and circuit breaker. Never raises; failures are in AIResult.error."""
+        if request is None:
+            return AIResult(error=no_key_error())
+        cached = cache_lookup(self.cache, request)
+        if cached is not None:
+            return AIResult(cached)
+        http = self._client()
+        timeout = httpx.Timeout(read_timeout or self.config.read_timeout, connect=self.config.connect_timeout)
+        result = await self.resilience.acall(request.endpoint, lambda: self._attempt(http, request, timeout))
+        if result.ok:
+            cache_store(self.cache, request, result.value)
+        return result
+
+    async def _attempt(self, http: httpx.AsyncClient, request: APIRequest, timeout: httpx.Timeout) -> Any:
+        async with self._semaphore:
+            try:
+                resp = await http.post(request.url, headers=request.headers, json=request.payload, timeout=timeout)
+            except httpx.HTTPError as e:
+                raise _httpx_error(e)
+        if resp.status_code >= 400:
+            raise http_error(resp.status_code, resp.headers.get("Retry-After"), resp.text)
+        return parse_reply(request, resp.content)
+
+    def _finish(self, result: AIResult) -> Any:
+        self.last_error = result.error
+        return result.value
+
+
+def _httpx_error(e: httpx.HTTPError) -> AIError:
+    if isinstance(e, httpx.ConnectTimeout):
+        # Nothing was sent, so it is safe to retry
+        return AIError("connection", f"Connect timeout: {e}")
+    if isinstance(e, httpx.TimeoutException):
+        return AIError("timeout", str(e) or "Read timeout")
+    if isinstance(e, httpx.TransportError):
+        return AIError("connection", str(e) or type(e).__name__)
+    return AIError("error", str(e))
+
+
+class AsyncLoopThread:
+    """One background thread running an asyncio loop for the whole app.
+
+    submit() schedules a coroutine from any thread and returns a
+    concurrent.futures.Future, so synchronous code (Qt slots, scripts)
+    can fan out any number of requests without a thread per request.
+    """
+
+    def __init__(self, name: str = "ai-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the loop after the current iteration and wait for the thread."""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+_shared_loop: Optional[AsyncLoopThread] = None
+_shared_lock = threading.Lock()
+
+
+def shared_loop() -> AsyncLoopThread:
+    """Process-wide AI loop thread, started on first use."""
+    global _shared_loop
+    with _shared_lock:
+        if _shared_loop is None:
+            _shared_loop = AsyncLoopThread()
+        return _shared_loop
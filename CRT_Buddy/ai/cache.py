@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable, Optional, Union
+
+
+
+def _user_cache_dir() -> str:
+    """Per-user cache location that survives reinstalls and frozen builds."""
+    if os.name == "nt":
+        base = os.getenv("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "CRT_Buddy", "ai")
+
+
+DEFAULT_CACHE_DIR = _user_cache_dir()
+
+Value = Union[str, bytes]
+
+
+def request_key(url: str, payload: dict) -> str:
+    """Content address of a provider call: sha256 of endpoint plus normalized payload.
+
+    The endpoint carries the provider (base URL, Stability engine); the
+    payload carries model, messages, temperature, max_tokens, image size
+    and seed. Credentials are never part of the key. Message text is
+    stripped of surrounding whitespace and only role/content/name are
+    kept, so cosmetic differences still hit the same entry.
+    """
+    normalized = dict(payload)
+    if "messages" in normalized:
+        normalized["messages"] = [
+            {k: (v.strip() if k == "content" and isinstance(v, str) else v)
+             for k, v in message.items() if k in ("role", "content", "name")}
+            for message in normalized["messages"]
+        ]
+    canonical = json.dumps([url, normalized], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk cache of AI responses, shared across runs.
+
+    Metadata and short text replies live in a SQLite index; binary values
+    (generated images) are stored as blob files named by their key. Entries
+    expire ttl seconds after they were stored, and once the cache grows past
+    max_bytes the least recently used entries are evicted.
+
+    Hits only read the index: the access time used for LRU is kept in
+    memory and written back in batches, so a text hit costs a single
+    primary-key lookup. Safe to share between threads.
+    """
+
+    TOUCH_BATCH = 64
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 200 * 2 ** 20,
+                 ttl: float = 7 * 24 * 3600, clock: Callable[[], float] = time.time):
+        self.directory = os.path.abspath(directory or DEFAULT_CACHE_DIR)
+        self.blob_dir = os.path.join(self.directory, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"),
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT,"              # inline str value, or NULL for a blob file
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    @classmethod
+    def from_config(cls, config) -> Optional["ResponseCache"]:
+        """Cache described by an AIConfig, or None when caching is disabled
+        or the cache directory cannot be used (the client then runs uncached)."""
+        if not config.cache_enabled:
+            return None
+        try:
+            return cls(config.cache_dir, max_bytes=int(config.cache_max_mb * 2 ** 20),
+                       ttl=config.cache_ttl_hours * 3600)
+        except (OSError, sqlite3.Error) as e:
+            print(f"[AI] Warning: response cache disabled ({e})")
+            return None
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.blob_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[Value]:
+        """Cached value, or None if missing or expired."""
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute("SELECT text, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._delete([key])
+                self.misses += 1
+                return None
+            self._touch(key, now)
+            text = row[0]
+            if text is not None:
+                self.hits += 1
+                return text
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            # Blob removed behind our back; forget the entry
+            with self._lock:
+                self._delete([key])
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, value: Value):
+        """Store a str (inline) or bytes (blob file), then enforce the size limit."""
+        now = self.clock()
+        if isinstance(value, str):
+            text, size = value, len(value.encode("utf-8"))
+        else:
+            text, size = None, len(value)
+            path = self._blob_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so readers never see a partial image
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, text, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now))
+            self._touched.pop(key, None)
+            self._prune(now)
+
+    def prune(self):
+        """Drop expired entries and evict LRU entries beyond max_bytes."""
+        with self._lock:
+            self._prune(self.clock())
+
+    def clear(self):
+        with self._lock:
+            keys = [row[0] for row in self._db.execute("SELECT key FROM entries")]
+            self._delete(keys)
+            self._touched.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touches()
+            self._db.close()
+
+    # --------- Internals (caller holds the lock) ---------
+    def _touch(self, key: str, now: float):
+        self._touched[key] = now
+        if len(self._touched) >= self.TOUCH_BATCH:
+            self._flush_touches()
+
+    def _flush_touches(self):
+        if self._touched:
+            self._db.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                                 [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def _prune(self, now: float):
+        expired = [row[0] for row in self._db.execute(
+            "SELECT key FROM entries WHERE created < ?", (now - self.ttl,))]
+        self._delete(expired)
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict least recently used down to 90% so a full cache does not prune on every put
+        self._flush_touches()
+        target = self.max_bytes * 0.9
+        evict = []
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total <= target:
+                break
+            evict.append(key)
+            total -= size
+        self._delete(evict)
+
+    def _delete(self, keys: list):
+        if not keys:
+            return
+        blobs = []
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            blobs += [row[0] for row in self._db.execute(
+                f"SELECT key FROM entries WHERE text IS NULL AND key IN ({','.join('?' * len(chunk))})", chunk)]
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in keys])
+        for key in keys:
+            self._touched.pop(key, None)
+        for key in blobs:
+            try:
+                os.remove(self._blob_path(key))
+            except OSError:
+                pass
@@ -1,8 +1,21 @@
 import os
+import base64
 import configparser
-from typing import List, Optional
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Optional
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .cache import ResponseCache, request_key
+    from .resilience import AIError, AIResult, Resilience, parse_retry_after
+except ImportError:
+    from cache import ResponseCache, request_key
+    from resilience import AIError, AIResult, Resilience, parse_retry_after
 
 
 class AIConfig:
@@ -24,6 +37,21 @@ class AIConfig:
         self.stability_api_key = None
         self.stability_engine = "stable-diffusion-v1-6"
         self.stability_base_url = "https://api.stability.ai"
+        # HTTP connection pool and timeouts (seconds)
+        self.pool_size = 4
+        self.connect_timeout = 5.0
+        self.read_timeout = 60.0
+        self.image_read_timeout = 120.0
+        # On-disk response cache (chat at temperature 0, generated images)
+        self.cache_enabled = True
+        self.cache_dir = None  # None: per-user cache dir (see ai/cache.py)
+        self.cache_max_mb = 200.0
+        self.cache_ttl_hours = 168.0
+        # Retries with backoff, and the circuit breaker that stops calling a failing provider
+        self.max_retries = 2
+        self.retry_base_delay = 0.5
+        self.breaker_threshold = 5
+        self.breaker_reset = 30.0
 
         # Load from config.ini if present
         self._load_from_config()
@@ -38,6 +66,19 @@ class AIConfig:
         self.stability_api_key = os.getenv("STABILITY_API_KEY", self.stability_api_key)
         self.stability_engine = os.getenv("STABILITY_ENGINE", self.stability_engine)
         self.stability_base_url = os.getenv("STABILITY_BASE_URL", self.stability_base_url)
+        self.pool_size = int(_env_number("AI_POOL_SIZE", self.pool_size))
+        self.connect_timeout = _env_number("AI_CONNECT_TIMEOUT", self.connect_timeout)
+        self.read_timeout = _env_number("AI_READ_TIMEOUT", self.read_timeout)
+        self.image_read_timeout = _env_number("AI_IMAGE_READ_TIMEOUT", self.image_read_timeout)
+        if os.getenv("AI_CACHE"):
+            self.cache_enabled = os.getenv("AI_CACHE").lower() not in ("0", "false", "no", "off")
+        self.cache_dir = os.getenv("AI_CACHE_DIR") or self.cache_dir
+        self.cache_max_mb = _env_number("AI_CACHE_MAX_MB", self.cache_max_mb)
+        self.cache_ttl_hours = _env_number("AI_CACHE_TTL_HOURS", self.cache_ttl_hours)
+        self.max_retries = int(_env_number("AI_MAX_RETRIES", self.max_retries))
+        self.retry_base_delay = _env_number("AI_RETRY_BASE_DELAY", self.retry_base_delay)
+        self.breaker_threshold = int(_env_number("AI_BREAKER_THRESHOLD", self.breaker_threshold))
+        self.breaker_reset = _env_number("AI_BREAKER_RESET", self.breaker_reset)
 
         # Explicit arg overrides
         if api_key:
@@ -68,112 +109,370 @@ class AIConfig:
                         self.stability_api_key = cfg.get("AI", "stability_api_key", fallback=self.stability_api_key)
                         self.stability_engine = cfg.get("AI", "stability_engine", fallback=self.stability_engine)
                         self.stability_base_url = cfg.get("AI", "stability_base_url", fallback=self.stability_base_url)
+                        self.pool_size = cfg.getint("AI", "pool_size", fallback=self.pool_size)
+                        self.connect_timeout = cfg.getfloat("AI", "connect_timeout", fallback=self.connect_timeout)
+                        self.read_timeout = cfg.getfloat("AI", "read_timeout", fallback=self.read_timeout)
+                        self.image_read_timeout = cfg.getfloat("AI", "image_read_timeout", fallback=self.image_read_timeout)
+                        self.cache_enabled = cfg.getboolean("AI", "cache", fallback=self.cache_enabled)
+                        self.cache_dir = cfg.get("AI", "cache_dir", fallback=self.cache_dir) or self.cache_dir
+                        self.cache_max_mb = cfg.getfloat("AI", "cache_max_mb", fallback=self.cache_max_mb)
+                        self.cache_ttl_hours = cfg.getfloat("AI", "cache_ttl_hours", fallback=self.cache_ttl_hours)
+                        self.max_retries = cfg.getint("AI", "max_retries", fallback=self.max_retries)
+                        self.retry_base_delay = cfg.getfloat("AI", "retry_base_delay", fallback=self.retry_base_delay)
+                        self.breaker_threshold = cfg.getint("AI", "breaker_threshold", fallback=self.breaker_threshold)
+                        self.breaker_reset = cfg.getfloat("AI", "breaker_reset", fallback=self.breaker_reset)
                     break
                 except Exception:
                     # Ignore parse errors and continue
                     pass
 
 
+def _env_number(name: str, default: float) -> float:
+    """Numeric environment override; unset or malformed values keep the default."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"[AI] Ignoring invalid {name}={value!r}")
+        return default
+
+
 class AIClient:
     """Minimal OpenAI-compatible client for chat and image generation.
 
     Supports OpenAI or any OpenAI-compatible server by customizing base_url.
+    Requests go through one pooled keep-alive session, so after the first
+    call to a host the TCP+TLS handshake is reused. Call close() (or use
+    the client as a context manager) when done.
+
+    Deterministic requests (chat at temperature 0, seeded Stability
+    images) are answered from the on-disk ResponseCache when the same
+    request was made before; anything else is always sent, so asking
+    again gives a fresh reply or picture.
+
+    Failed calls are retried with backoff and guarded by a per-endpoint
+    circuit breaker (see Resilience). chat() and generate_image() return
+    None on failure and leave the reason in last_error; execute() returns
+    the full AIResult.
     """
 
-    def __init__(self, config: Optional[AIConfig] = None):
+    def __init__(self, config: Optional[AIConfig] = None, resilience: Optional[Resilience] = None):
         self.config = config or AIConfig()
+        self.session = self._make_session()
+        self.cache = ResponseCache.from_config(self.config)
+        self.resilience = resilience or Resilience.from_config(self.config)
+        self.last_error: Optional[AIError] = None
         if not self.config.api_key:
             # Allow running without key; callers should handle None outputs gracefully
             print("[AI] Warning: No API key set. Set OPENAI_API_KEY or AI_API_KEY.")
 
+    def _make_session(self) -> requests.Session:
+        session = requests.Session()
+        # pool_maxsize connections kept alive per host; extra concurrent requests
+        # block for a free connection instead of opening throwaway ones
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.config.pool_size, pool_block=True)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _timeout(self, read_timeout: float) -> tuple:
+        """(connect, read) timeout: fail fast on dead hosts, wait for slow models."""
+        return (self.config.connect_timeout, read_timeout)
+
+    def close(self):
+        """Close pooled connections and the response cache."""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self) -> "AIClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     # --------- Chat Completion ---------
     def chat(self, messages: List[dict], model: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 512) -> Optional[str]:
-        if not self.config.api_key:
-            return None
-        url = f"{self.config.base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.config.api_key}",
+        request = chat_request(self.config, messages, model, temperature, max_tokens)
+        return self._finish(self.execute(request, self.config.read_timeout))
+
+    def chat_stream(self, messages: List[dict], model: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 512) -> Iterator[str]:
+        """Yield the reply as it is generated (server-sent events).
+
+        Opening the stream is retried like chat(). If it cannot be opened,
+        or fails mid-stream, the stream ends after whatever text already
+        arrived and last_error says why.
+        """
+        request = chat_request(self.config, messages, model, temperature, max_tokens, stream=True)
+        if request is None:
+            self.last_error = no_key_error()
+            return
+        result = self.resilience.call(request.endpoint, lambda: self._open_stream(request))
+        self.last_error = result.error
+        if not result.ok:
+            return
+        with result.value as resp:
+            try:
+                resp.encoding = "utf-8"
+                # chunk_size=None hands over each network chunk as it arrives
+                for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                    event = stream_event(line)
+                    if event == STREAM_DONE:
+                        break
+                    if event is not None:
+                        delta = stream_delta(event)
+                        if delta:
+                            yield delta
+            except requests.RequestException as e:
+                self.last_error = _requests_error(e)
+            except ValueError as e:
+                self.last_error = AIError("bad_response", f"Malformed stream event: {e}")
+
+    def _open_stream(self, request: "APIRequest") -> requests.Response:
+        try:
+            resp = self.session.post(request.url, headers=request.headers, json=request.payload, stream=True,
+                                     timeout=self._timeout(self.config.read_timeout))
+        except requests.RequestException as e:
+            raise _requests_error(e)
+        if resp.status_code >= 400:
+            with resp:
+                raise http_error(resp.status_code, resp.headers.get("Retry-After"), resp.text)
+        return resp
+
+    # --------- Image Generation ---------
+    def generate_image(self, prompt: str, model: Optional[str] = None, size: str = "1024x1024",
+                       seed: Optional[int] = None) -> Optional[bytes]:
+        request = image_request(self.config, prompt, model, size, seed)
+        return self._finish(self.execute(request, self.config.image_read_timeout))
+
+    # --------- Execution ---------
+    def execute(self, request: Optional["APIRequest"], read_timeout: Optional[float] = None) -> AIResult:
+        """Send a request built by chat_request()/image_request(), with cache, retries
+        and circuit breaker. Never raises; failures are in AIResult.error."""
+        if request is None:
+            return AIResult(error=no_key_error())
+        cached = cache_lookup(self.cache, request)
+        if cached is not None:
+            return AIResult(cached)
+        timeout = self._timeout(read_timeout or self.config.read_timeout)
+        result = self.resilience.call(request.endpoint, lambda: self._attempt(request, timeout))
+        if result.ok:
+            cache_store(self.cache, request, result.value)
+        return result
+
+    def _attempt(self, request: "APIRequest", timeout: tuple) -> Any:
+        try:
+            resp = self.session.post(request.url, headers=request.headers, json=request.payload, timeout=timeout)
+        except requests.RequestException as e:
+            raise _requests_error(e)
+        if resp.status_code >= 400:
+            raise http_error(resp.status_code, resp.headers.get("Retry-After"), resp.text)
+        return parse_reply(request, resp.content)
+
+    def _finish(self, result: AIResult) -> Any:
+        self.last_error = result.error
+        return result.value
+
+
+def _requests_error(e: requests.RequestException) -> AIError:
+    if isinstance(e, requests.ReadTimeout):
+        return AIError("timeout", str(e))
+    # Includes ConnectTimeout: the request never got through, so it is safe to retry
+    if isinstance(e, (requests.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+        return AIError("connection", str(e))
+    return AIError("error", str(e))
+
+
+# --------- Request building (shared by AIClient and AsyncAIClient) ---------
+@dataclass
+class APIRequest:
+    """One provider call: where to POST, what to send and how to read the reply."""
+    url: str
+    headers: dict
+    payload: dict
+    parse: Callable[[dict], Any]
+    label: str
+    # Set when identical requests may be answered from the response cache
+    cache_key: Optional[str] = None
+
+    @property
+    def endpoint(self) -> str:
+        """Host and path the request goes to. Circuit breakers are per endpoint, so
+        a failing chat API does not block image generation on the same host."""
+        parts = urlsplit(self.url)
+        return f"{parts.netloc}{parts.path}"
+
+
+def chat_request(config: AIConfig, messages: List[dict], model: Optional[str] = None,
+                 temperature: float = 0.7, max_tokens: int = 512, stream: bool = False) -> Optional[APIRequest]:
+    """Chat completion request, or None when no API key is configured."""
+    if not config.api_key:
+        return None
+    request = APIRequest(
+        url=f"{config.base_url}/chat/completions",
+        headers={
+            "Authorization": f"Bearer {config.api_key}",
             "Content-Type": "application/json",
-        }
-        payload = {
-            "model": model or self.config.chat_model,
+        },
+        payload={
+            "model": model or config.chat_model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
-        }
-        try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=60)
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get("choices", [{}])[0].get("message", {}).get("content")
-        except Exception as e:
-            print(f"[AI] Chat error: {e}")
-            return None
+        },
+        parse=lambda data: data.get("choices", [{}])[0].get("message", {}).get("content"),
+        label="Chat",
+    )
+    if stream:
+        request.payload["stream"] = True
+    elif temperature == 0:
+        # Only deterministic completions are worth replaying
+        request.cache_key = request_key(request.url, request.payload)
+    return request
 
-    # --------- Image Generation ---------
-    def generate_image(self, prompt: str, model: Optional[str] = None, size: str = "1024x1024") -> Optional[bytes]:
-        # Stability AI branch
-        if self.config.image_provider.lower() == "stability":
-            api_key = self.config.stability_api_key or self.config.api_key
-            if not api_key:
-                return None
-            # Parse size like "1024x1024"
-            try:
-                w, h = [int(x) for x in size.lower().split("x")[:2]]
-            except Exception:
-                w, h = 1024, 1024
-            url = f"{self.config.stability_base_url}/v1/generation/{self.config.stability_engine}/text-to-image"
-            headers = {
+
+# --------- Streaming (server-sent events) ---------
+STREAM_DONE = "[DONE]"
+
+
+def stream_event(line: str) -> Optional[str]:
+    """Data of one SSE line; None for blank lines, comments and other fields."""
+    if not line.startswith("data:"):
+        return None
+    return line[5:].strip()
+
+
+def stream_delta(event: str) -> str:
+    """Text added by one streamed chat chunk ("" for role/finish chunks)."""
+    choices = json.loads(event).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+
+def image_request(config: AIConfig, prompt: str, model: Optional[str] = None,
+                  size: str = "1024x1024", seed: Optional[int] = None) -> Optional[APIRequest]:
+    """Image generation request for the configured provider, or None without a key.
+
+    Images are only cached when the request is deterministic: a Stability
+    request with an explicit seed. The OpenAI images API takes no seed, so
+    its images are never cached and every call draws a new picture.
+    """
+    # Stability AI branch
+    if config.image_provider.lower() == "stability":
+        api_key = config.stability_api_key or config.api_key
+        if not api_key:
+            return None
+        # Parse size like "1024x1024"
+        try:
+            w, h = [int(x) for x in size.lower().split("x")[:2]]
+        except Exception:
+            w, h = 1024, 1024
+        request = APIRequest(
+            url=f"{config.stability_base_url}/v1/generation/{config.stability_engine}/text-to-image",
+            headers={
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json",
                 "Accept": "application/json",
-            }
-            payload = {
+            },
+            payload={
                 "text_prompts": [{"text": prompt}],
                 "cfg_scale": 7,
                 "height": h,
                 "width": w,
                 "samples": 1,
-            }
-            try:
-                resp = requests.post(url, headers=headers, json=payload, timeout=120)
-                resp.raise_for_status()
-                data = resp.json()
-                arts = data.get("artifacts") or []
-                if not arts:
-                    return None
-                b64 = arts[0].get("base64")
-                if not b64:
-                    return None
-                import base64
-                return base64.b64decode(b64)
-            except Exception as e:
-                print(f"[AI] Stability image error: {e}")
-                return None
-
-        # Default: OpenAI-compatible images API
-        if not self.config.api_key:
-            return None
-        url = f"{self.config.base_url}/images/generations"
-        headers = {
-            "Authorization": f"Bearer {self.config.api_key}",
+            },
+            parse=_stability_image,
+            label="Stability image",
+        )
+        if seed is not None:
+            request.payload["seed"] = seed
+            request.cache_key = request_key(request.url, request.payload)
+        return request
+
+    # Default: OpenAI-compatible images API
+    if not config.api_key:
+        return None
+    request = APIRequest(
+        url=f"{config.base_url}/images/generations",
+        headers={
+            "Authorization": f"Bearer {config.api_key}",
             "Content-Type": "application/json",
-        }
-        payload = {
-            "model": model or self.config.image_model,
+        },
+        payload={
+            "model": model or config.image_model,
             "prompt": prompt,
             "size": size,
             "response_format": "b64_json",
-        }
+        },
+        parse=_openai_image,
+        label="Image",
+    )
+    return request
+
+
+def no_key_error() -> AIError:
+    return AIError("no_key", "No API key set. Set OPENAI_API_KEY or AI_API_KEY.")
+
+
+def http_error(status: int, retry_after: Optional[str], body: str) -> AIError:
+    """AIError for an error status, with the provider's message if it sent one."""
+    message = body.strip()[:200] or "no details"
+    try:
+        detail = json.loads(body).get("error")
+        message = (detail.get("message") if isinstance(detail, dict) else detail) or message
+    except (ValueError, AttributeError):
+        pass
+    return AIError("http", message, status=status, retry_after=parse_retry_after(retry_after))
+
+
+def parse_reply(request: APIRequest, body: bytes) -> Any:
+    """Parsed reply of a 2xx response; AIError if it is not what the API promises."""
+    try:
+        value = request.parse(json.loads(body))
+    except (ValueError, TypeError, AttributeError, IndexError) as e:
+        raise AIError("bad_response", f"{request.label} reply could not be parsed: {e}")
+    if value is None:
+        raise AIError("bad_response", f"{request.label} reply was empty")
+    return value
+
+
+def cache_lookup(cache: Optional[ResponseCache], request: APIRequest) -> Any:
+    """Cached reply for a cacheable request, else None (also if the cache is unreadable)."""
+    if cache is None or request.cache_key is None:
+        return None
+    try:
+        return cache.get(request.cache_key)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+def cache_store(cache: Optional[ResponseCache], request: APIRequest, value: Any) -> Any:
+    """Remember a successful reply of a cacheable request; returns value.
+
+    A full disk or locked index only costs the cache entry, never the reply.
+    """
+    if value is not None and cache is not None and request.cache_key is not None:
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=120)
-            resp.raise_for_status()
-            data = resp.json()
-            b64 = data.get("data", [{}])[0].get("b64_json")
-            if not b64:
-                return None
-            import base64
-            return base64.b64decode(b64)
-        except Exception as e:
-            print(f"[AI] Image error: {e}")
-            return None
+            cache.put(request.cache_key, value)
+        except (OSError, sqlite3.Error):
+            pass
+    return value
+
+
+def _stability_image(data: dict) -> Optional[bytes]:
+    arts = data.get("artifacts") or []
+    if not arts:
+        return None
+    b64 = arts[0].get("base64")
+    if not b64:
+        return None
+    return base64.b64decode(b64)
+
+
+def _openai_image(data: dict) -> Optional[bytes]:
+    b64 = data.get("data", [{}])[0].get("b64_json")
+    if not b64:
+        return None
+    return base64.b64decode(b64)
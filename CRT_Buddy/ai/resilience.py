@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Worth another attempt: the request never reached the model or the
+# provider said "not now"
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class AIError(Exception):
+    """Why a provider call failed.
+
+    kind is one of:
+      no_key        no API key configured, nothing was sent
+      connection    could not connect (DNS, refused, reset, connect timeout)
+      timeout       connected, but the reply did not arrive within read_timeout
+      http          the provider answered with an error status
+      bad_response  2xx reply that could not be parsed
+      circuit_open  skipped: the provider failed repeatedly and is cooling down
+      error         unexpected failure inside the client
+    """
+
+    def __init__(self, kind: str, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None, provider: Optional[str] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+        self.provider = provider
+        self.attempts = 0
+
+    @property
+    def retryable(self) -> bool:
+        """Safe to send again: nothing reached the model, or the provider asked us to."""
+        return self.kind == "connection" or (self.kind == "http" and self.status in RETRY_STATUSES)
+
+    @property
+    def provider_fault(self) -> bool:
+        """Counts against the provider's circuit breaker (outage, not a bad request)."""
+        return self.kind in ("connection", "timeout") or (self.kind == "http" and (self.status or 0) >= 500)
+
+    def __str__(self) -> str:
+        prefix = f"HTTP {self.status}: " if self.status else ""
+        return f"{prefix}{self.message}"
+
+    def __repr__(self) -> str:
+        return f"AIError({self.kind!r}, {self.message!r}, status={self.status}, attempts={self.attempts})"
+
+
+@dataclass
+class AIResult:
+    """Outcome of one logical call, after retries."""
+    value: Any = None
+    error: Optional[AIError] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
+
+
+class CircuitBreaker:
+    """Fails fast while a provider is down.
+
+    closed     calls go through; failure_threshold consecutive provider
+               faults open the circuit
+    open       calls are refused for reset_timeout seconds
+    half_open  one trial call is let through; success closes the circuit,
+               failure opens it again. A trial that never reports back
+               (cancelled, interrupted) is given up after reset_timeout
+               and another trial is allowed.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = self.clock()
+            if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and (
+                    not self._trial_running or now - self._trial_started >= self.reset_timeout):
+                self._trial_running = True
+                self._trial_started = now
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until a trial call may go through."""
+        with self._lock:
+            if self.state == "open":
+                return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+            if self.state == "half_open" and self._trial_running:
+                return max(0.0, self.reset_timeout - (self.clock() - self._trial_started))
+            return 0.0
+
+    def release_trial(self):
+        """Free the half-open trial slot of a call that ended without a verdict."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+            self._trial_running = False
+
+
+class Resilience:
+    """Retry with jittered exponential backoff plus a circuit breaker per endpoint.
+
+    call()/acall() run one attempt function until it returns, raises a
+    non-retryable AIError, or max_attempts is used up. Between attempts
+    they wait the provider's Retry-After if given (up to max_retry_after;
+    longer requests are not retried), otherwise a "full jitter" delay
+    drawn from [0, min(max_delay, base_delay * 2 ** n)].
+
+    sleep, asleep, clock and rng are injectable so tests run instantly.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 max_retry_after: float = 30.0, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 sleep: Callable[[float], None] = time.sleep,
+                 asleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.sleep = sleep
+        self.asleep = asleep
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> "Resilience":
+        return cls(max_attempts=config.max_retries + 1, base_delay=config.retry_base_delay,
+                   failure_threshold=config.breaker_threshold, reset_timeout=config.breaker_reset)
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = self._breakers[provider] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout, self.clock)
+            return breaker
+
+    def backoff(self, attempt: int, error: AIError) -> Optional[float]:
+        """Delay before attempt + 1, or None if error should not be retried."""
+        if not error.retryable or attempt >= self.max_attempts:
+            return None
+        if error.retry_after is not None:
+            return error.retry_after if error.retry_after <= self.max_retry_after else None
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, provider: str, attempt: Callable[[], Any]) -> AIResult:
+        """Run attempt() with retries; its AIErrors become the result's error."""
+        breaker = self.breaker(provider)
+        error = None
+        for number in range(1, self.max_attempts + 1):
+            refused = self._refused(breaker, provider)
+            if refused is not None:
+                # Report the real failure if the circuit opened during our retries
+                return self._give_up(error or refused, number - 1)
+            try:
+                value = attempt()
+            except AIError as e:
+                error = e
+            except Exception as e:
+                error = AIError("error", f"{type(e).__name__}: {e}")
+            except BaseException:
+                # Cancelled or interrupted: no verdict on the provider, but never
+                # leave a half-open trial marked as running
+                breaker.release_trial()
+                raise
+            else:
+                breaker.record_success()
+                return AIResult(value, None, number)
+            delay = self._failed(breaker, provider, error, number)
+            if delay is None:
+                return self._give_up(error, number)
+            self.sleep(delay)
+
+    async def acall(self, provider: str, attempt: Callable[[], Awaitable[Any]]) -> AIResult:
+        """call() for coroutine attempts; waits with asleep()."""
+        breaker = self.breaker(provider)
+        error = None
+        for number in range(1, self.max_attempts + 1):
+            refused = self._refused(breaker, provider)
+            if refused is not None:
+                return self._give_up(error or refused, number - 1)
+            try:
+                value = await attempt()
+            except AIError as e:
+                error = e
+            except Exception as e:
+                error = AIError("error", f"{type(e).__name__}: {e}")
+            except BaseException:
+                # Cancelled or interrupted: no verdict on the provider, but never
+                # leave a half-open trial marked as running
+                breaker.release_trial()
+                raise
+            else:
+                breaker.record_success()
+                return AIResult(value, None, number)
+            delay = self._failed(breaker, provider, error, number)
+            if delay is None:
+                return self._give_up(error, number)
+            await self.asleep(delay)
+
+    @staticmethod
+    def _give_up(error: AIError, attempts: int) -> AIResult:
+        error.attempts = attempts
+        return AIResult(None, error, attempts)
+
+    def _refused(self, breaker: CircuitBreaker, provider: str) -> Optional[AIError]:
+        if breaker.allow():
+            return None
+        return AIError("circuit_open",
+                       f"{provider} is failing; retrying in {breaker.retry_in():.0f}s",
+                       provider=provider)
+
+    def _failed(self, breaker: CircuitBreaker, provider: str, error: AIError, number: int) -> Optional[float]:
+        error.provider = error.provider or provider
+        if error.provider_fault:
+            breaker.record_failure()
+        else:
+            # The provider answered; a 4xx says nothing about an outage
+            breaker.record_success()
+        return self.backoff(number, error)
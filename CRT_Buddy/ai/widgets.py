@@ -1,57 +1,86 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
+import concurrent.futures
+import traceback
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
 
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtCore import Qt, QObject, QTimer, pyqtSignal, pyqtSlot
+from PyQt6.QtGui import QPixmap, QTextCursor
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QLineEdit, QPushButton, QLabel, QComboBox, QFileDialog
 )
 
 try:
-    from .client import AIClient, AIConfig
+    from .async_client import AsyncAIClient, shared_loop
+    from .resilience import AIResult
+    from .client import image_request
 except ImportError:
     # Allow running this file directly: python ai/widgets.py
-    from client import AIClient, AIConfig
+    from async_client import AsyncAIClient, shared_loop
+    from resilience import AIResult
+    from client import image_request
 import configparser, os, requests
 
 
-class WorkerChat(QThread):
-    finished = pyqtSignal(str)
+class AsyncBridge(QObject):
+    """Runs coroutines on the shared AI loop thread, callbacks on the GUI thread.
 
-    def __init__(self, client: AIClient, system_prompt: str, user_text: str):
+    Every widget request is a task on the one loop, so any number of
+    in-flight requests costs no extra threads.
+    """
+    _done = pyqtSignal(object, object)
+
+    def __init__(self):
         super().__init__()
-        self.client = client
-        self.system_prompt = system_prompt
-        self.user_text = user_text
+        # Emitted from the loop thread; Qt queues delivery to this object's thread
+        self._done.connect(self._deliver)
 
-    def run(self):
-        msg = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": self.user_text},
-        ]
-        text = self.client.chat(msg) or "(No response. Check API key/network.)"
-        self.finished.emit(text)
+    @pyqtSlot(object, object)
+    def _deliver(self, callback: Callable[[Any], None], result: Any):
+        callback(result)
 
+    def run(self, coro: Awaitable, callback: Callable[[Any], None]):
+        """Schedule coro; callback gets its result, or None if it failed or was cancelled."""
+        future = shared_loop().submit(coro)
+        future.add_done_callback(lambda f: self._done.emit(callback, self._result(f)))
 
-class WorkerImage(QThread):
-    finished = pyqtSignal(bytes)
+    @staticmethod
+    def _result(future: concurrent.futures.Future) -> Any:
+        if future.cancelled():
+            return None
+        error = future.exception()
+        if error is not None:
+            # The callback only sees None, so leave the reason in the log
+            print(f"[AI] Warning: widget request failed: {error!r}")
+            traceback.print_exception(type(error), error, error.__traceback__)
+            return None
+        return future.result()
+
+
+_bridge: Optional[AsyncBridge] = None
 
-    def __init__(self, client: AIClient, prompt: str):
-        super().__init__()
-        self.client = client
-        self.prompt = prompt
 
-    def run(self):
-        data = self.client.generate_image(self.prompt) or b""
-        self.finished.emit(data)
+def async_bridge() -> AsyncBridge:
+    """GUI-side bridge, created on first use (after QApplication exists)."""
+    global _bridge
+    if _bridge is None:
+        _bridge = AsyncBridge()
+    return _bridge
 
 
 class AIChatWidget(QWidget):
+    # Streamed tokens are painted at most once per frame (~60 Hz)
+    FLUSH_INTERVAL_MS = 16
+
     def __init__(self, parent: Optional[QWidget] = None):
         super().__init__(parent)
-        self.client = AIClient()
+        self.client = AsyncAIClient()
+        # Tokens arrive on the AI loop thread; the GUI thread drains them on a timer
+        self._tokens: deque = deque()
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flush_tokens)
 
         layout = QVBoxLayout(self)
         self.history = QTextEdit()
@@ -80,19 +109,56 @@ class AIChatWidget(QWidget):
             return
         self.history.append(f"You: {text}")
         self.input.clear()
+        # One reply streams at a time so tokens never interleave
+        self.send_btn.setEnabled(False)
+        self.input.setEnabled(False)
 
-        self.worker = WorkerChat(self.client, self.system.text(), text)
-        self.worker.finished.connect(self.on_reply)
-        self.worker.start()
-
-    def on_reply(self, content: str):
-        self.history.append(f"AI: {content}")
+        msg = [
+            {"role": "system", "content": self.system.text()},
+            {"role": "user", "content": text},
+        ]
+        self.history.append("AI: ")
+        self._flush_timer.start()
+        async_bridge().run(self._stream_reply(msg), self.on_reply)
+
+    async def _stream_reply(self, msg: list) -> bool:
+        """Runs on the AI loop; only queues tokens, never touches widgets."""
+        received = False
+        async for token in self.client.chat_stream(msg):
+            self._tokens.append(token)
+            received = True
+        return received
+
+    def _flush_tokens(self):
+        parts = []
+        while self._tokens:
+            parts.append(self._tokens.popleft())
+        if parts:
+            self._append_reply("".join(parts))
+
+    def _append_reply(self, text: str):
+        cursor = self.history.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        self.history.ensureCursorVisible()
+
+    def on_reply(self, received: Optional[bool]):
+        self._flush_timer.stop()
+        self._flush_tokens()
+        error = self.client.last_error
+        if error is not None:
+            self._append_reply(f" [interrupted: {error}]" if received else f"({error})")
+        elif not received:
+            self._append_reply("(No response.)")
+        self.send_btn.setEnabled(True)
+        self.input.setEnabled(True)
+        self.input.setFocus()
 
 
 class AIImageWidget(QWidget):
     def __init__(self, parent: Optional[QWidget] = None):
         super().__init__(parent)
-        self.client = AIClient()
+        self.client = AsyncAIClient()
 
         layout = QVBoxLayout(self)
         self.prompt = QTextEdit()
@@ -118,15 +184,17 @@ class AIImageWidget(QWidget):
         if not text:
             return
         self.preview.setText("Generating...")
-        self.worker = WorkerImage(self.client, text)
-        self.worker.finished.connect(self.on_image)
-        self.worker.start()
-
-    def on_image(self, data: bytes):
-        if not data:
-            self.preview.setText("Failed to generate image. Check API key/network.")
+        # Several generations may be in flight; each result carries its own error
+        request = image_request(self.client.config, text)
+        async_bridge().run(self.client.execute(request, self.client.config.image_read_timeout), self.on_image)
+
+    def on_image(self, result: Optional[AIResult]):
+        if result is None or not result.ok:
+            error = result.error if result is not None else "no image returned"
+            self.preview.setText(f"Failed to generate image: {error}")
             self.save_btn.setEnabled(False)
             return
+        data = result.value
         self._last_image = data
         pix = QPixmap()
         pix.loadFromData(data)
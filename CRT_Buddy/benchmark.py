@@ -0,0 +1,243 @@
+"""
+CRT Buddy - Benchmark Suite
+Times every effect, text style, MemeEngine entry point and input decode
+
+Usage (from the CRT_Buddy directory):
+    python benchmark.py -o results.json
+    python benchmark.py --sizes 320x320,800x600 --filter effect/
+    python benchmark.py --compare baseline.json results.json --threshold 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from effects.y2k_styles import Y2KStyles
+from effects.text_effects import TextEffects
+from generators.meme_engine import MemeEngine
+
+
+SIZES = ((320, 320), (800, 600), (1200, 1200), (3840, 2160))
+# Longest side MemeEngine.generate_image_meme downsizes inputs to, and a
+# camera-sized JPEG where draft mode can decode at a reduced scale
+DECODE_TARGET = 1200
+DECODE_SIZE = (6000, 4000)
+
+
+def sample_image(size, seed=0):
+    """Deterministic photo-like input: smooth gradients plus noise"""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([x / width, y / height, (x + y) / (width + height)], axis=2) * 200
+    base += rng.normal(0, 12, base.shape).astype(np.float32)
+    return Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+
+
+def full_decode(path, max_size=DECODE_TARGET):
+    """Load path the way the engine did before draft mode: full decode, one LANCZOS pass"""
+    img = Image.open(path).convert('RGB')
+    ratio = max_size / max(img.size)
+    return img.resize(tuple(max(1, int(dim * ratio)) for dim in img.size), Image.Resampling.LANCZOS)
+
+
+def build_cases(sizes, workdir):
+    """(name, size, fn) for everything the suite times
+
+    Each fn is called with no arguments and does one full operation.
+    Inputs are prepared here so only the operation itself is timed.
+    """
+    styles = Y2KStyles(seed=0)
+    text_effects = TextEffects()
+    engine = MemeEngine(output_dir=workdir, seed=0)
+    cases = []
+
+    for size in sizes:
+        img = sample_image(size)
+        label = f"{size[0]}x{size[1]}"
+
+        for effect in Y2KStyles.EFFECTS:
+            cases.append((f"effect/{effect}", label, size,
+                          lambda img=img, effect=effect: styles.apply_effect(img, effect)))
+
+        background = Image.new('RGB', size, (0, 0, 64))
+        for style in TextEffects.STYLES:
+            cases.append((f"text/{style}", label, size,
+                          lambda bg=background, style=style:
+                          text_effects.apply_effect(bg.copy(), "Y2K FOREVER", style)))
+
+        # The engine reads images from disk, so include decoding
+        path = os.path.join(workdir, f"input_{label}.jpg")
+        img.save(path, quality=90)
+        cases.append(("engine/text_meme", label, size,
+                      lambda size=size: engine.generate_text_meme("CYBER DREAMS 2000",
+                                                                  size=size, seed=1)))
+        cases.append(("engine/image_meme", label, size,
+                      lambda path=path: engine.generate_image_meme(path, "Y2K", 'crt', seed=1)))
+        cases.append(("engine/image_meme_full", label, size,
+                      lambda path=path: engine.generate_image_meme(
+                          path, "Y2K", 'neon', seed=1, full_resolution=True)))
+        cases.append(("engine/save_png", label, size,
+                      lambda img=img: os.remove(engine.save_meme(img, "bench", compress_level=1))))
+
+    # Input loading only, old full decode vs draft mode + reduce(); one
+    # fixed size, upscaled from a small sample to keep setup cheap
+    label = f"{DECODE_SIZE[0]}x{DECODE_SIZE[1]}"
+    path = os.path.join(workdir, f"input_{label}.jpg")
+    sample_image((DECODE_SIZE[0] // 4, DECODE_SIZE[1] // 4)).resize(
+        DECODE_SIZE, Image.Resampling.BICUBIC).save(path, quality=90)
+    cases.append(("decode/full", label, DECODE_SIZE, lambda: full_decode(path)))
+    cases.append(("decode/draft", label, DECODE_SIZE,
+                  lambda: engine._load_image(path, DECODE_TARGET)))
+
+    # Picks its own size (one of three), so it is timed once
+    cases.append(("engine/random_meme", "random", (800, 600),
+                  lambda: engine.generate_random_meme(seed=1)))
+    return cases
+
+
+def measure(fn, pixels, min_time=0.5, max_reps=50):
+    """Time fn: median/min ms over repeated calls, throughput and peak memory
+
+    Peak memory is the tracemalloc peak of one extra traced call. NumPy
+    buffers are traced; Pillow's C-side image memory is not.
+    """
+    fn()  # Warm caches (fonts, LUTs, plates)
+
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_reps and (len(times) < 3 or time.perf_counter() - start < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    median = float(np.median(times))
+    return {
+        'ms': median * 1000,
+        'ms_min': min(times) * 1000,
+        'mp_per_s': pixels / 1e6 / median if median else 0.0,
+        'peak_mb': peak / 2 ** 20,
+        'reps': len(times),
+    }
+
+
+def run_suite(sizes=SIZES, name_filter=None, min_time=0.5, stream=sys.stdout):
+    """Run all cases and return the JSON-ready result document"""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, label, size, fn in build_cases(sizes, workdir):
+            if name_filter and name_filter not in name:
+                continue
+            # The engine prints a line per save; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = measure(fn, size[0] * size[1], min_time)
+            results.append({'name': name, 'size': label, **stats})
+            print(f"{name:24s} {label:>10s} {stats['ms']:9.2f} ms "
+                  f"{stats['mp_per_s']:8.1f} MP/s {stats['peak_mb']:8.1f} MB",
+                  file=stream)
+
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=10.0, stream=sys.stdout):
+    """Print per-case change in median ms; returns the regressed case keys
+
+    A case regresses when it is more than threshold percent slower than
+    in the baseline. Cases only one side ran (e.g. a filtered run) are
+    counted but not compared.
+    """
+    base = {(r['name'], r['size']): r for r in baseline['results']}
+    regressions = []
+    unmatched = 0
+
+    for result in current['results']:
+        key = (result['name'], result['size'])
+        old = base.pop(key, None)
+        if old is None:
+            unmatched += 1
+            continue
+        change = (result['ms'] / old['ms'] - 1) * 100 if old['ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{key[0]:24s} {key[1]:>10s} {old['ms']:9.2f} -> {result['ms']:9.2f} ms "
+              f"({change:+6.1f}%){flag}", file=stream)
+
+    unmatched += len(base)
+    if unmatched:
+        print(f"({unmatched} case(s) only in one file, not compared)", file=stream)
+    return regressions
+
+
+def parse_sizes(value):
+    try:
+        return tuple(tuple(int(part) for part in item.lower().split('x'))
+                     for item in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH[,WxH...], got {value!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='CRT Buddy effect benchmarks.')
+    parser.add_argument('--sizes', type=parse_sizes, default=SIZES,
+                        help='comma separated sizes (default: 320x320,800x600,1200x1200,3840x2160)')
+    parser.add_argument('--filter', help='only run cases whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='seconds to spend timing each case (default: 0.5)')
+    parser.add_argument('--output', '-o', help='write JSON results here')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent slowdown that counts as a regression (default: 10)')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%")
+        return 1 if regressions else 0
+
+    document = run_suite(args.sizes, args.filter, args.min_time)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+CRT Buddy - Render Worker
+Runs meme rendering and saving off the GUI thread
+"""
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class _JobSignals(QObject):
+    """Signals a RenderJob emits from its pool thread"""
+    progress = pyqtSignal(int, str)   # job id, status text
+    finished = pyqtSignal(int, object)  # job id, result of the last step
+    failed = pyqtSignal(int, str)     # job id, error message
+
+
+class RenderJob(QRunnable):
+    """A render split into (status text, step) pairs
+
+    Each step gets the previous step's result. Before every step the job
+    checks whether it has gone stale and, if so, stops without running
+    the rest (e.g. it never saves an image nobody is waiting for).
+    """
+
+    def __init__(self, job_id, steps, is_stale, signals):
+        super().__init__()
+        self.job_id = job_id
+        self.steps = steps
+        self.is_stale = is_stale
+        self.signals = signals
+
+    def run(self):
+        result = None
+        try:
+            for status, step in self.steps:
+                if self.is_stale(self.job_id):
+                    # Still report back so the queue forgets the job; the
+                    # queue drops signals from stale jobs anyway
+                    self.signals.finished.emit(self.job_id, None)
+                    return
+                self.signals.progress.emit(self.job_id, status)
+                result = step(result)
+        except Exception as e:
+            print(f"Render job {self.job_id} failed: {e}")
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, result)
+
+
+class RenderQueue(QObject):
+    """Render worker subsystem bridged to the GUI thread by signals
+
+    Jobs are submitted on a channel ('image', 'text', ...) and by default
+    every job runs to completion. A job submitted with supersede=True makes
+    the previous superseding job on its channel stale: it is skipped if
+    still queued, stops at its next step if running, and its signals are
+    dropped. Signals are delivered on the GUI thread.
+    """
+
+    progress = pyqtSignal(str, str)   # channel, status text
+    finished = pyqtSignal(str, object)  # channel, result
+    failed = pyqtSignal(str, str)     # channel, error message
+
+    def __init__(self, parent=None, max_threads=1):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        # One thread keeps renders ordered and the engine's RNG single-threaded
+        self.pool.setMaxThreadCount(max_threads)
+        self._next_id = 0
+        self._latest = {}   # channel -> newest superseding job id
+        self._channels = {}  # live job id -> channel
+        self._superseding = set()  # live job ids submitted with supersede=True
+
+        self._signals = _JobSignals(self)
+        self._signals.progress.connect(self._on_progress)
+        self._signals.finished.connect(self._on_finished)
+        self._signals.failed.connect(self._on_failed)
+
+    def submit(self, channel, steps, supersede=False):
+        """Queue [(status text, fn(previous_result)), ...]; returns the job id
+
+        With supersede=True the job replaces the previous superseding job
+        on the channel (e.g. re-rendering a newly dropped image); other jobs
+        never go stale, so every requested meme is rendered and saved.
+        """
+        self._next_id += 1
+        job_id = self._next_id
+        if supersede:
+            self._latest[channel] = job_id
+            self._superseding.add(job_id)
+        self._channels[job_id] = channel
+        self.pool.start(RenderJob(job_id, steps, self._is_stale, self._signals))
+        return job_id
+
+    def cancel(self, channel):
+        """Make every pending job on a channel stale"""
+        self._latest.pop(channel, None)
+        for job_id in [j for j, c in self._channels.items() if c == channel]:
+            del self._channels[job_id]
+            self._superseding.discard(job_id)
+
+    def is_busy(self):
+        return self.pool.activeThreadCount() > 0
+
+    def wait(self, msecs=-1):
+        """Block until all jobs are done (e.g. before quitting)"""
+        return self.pool.waitForDone(msecs)
+
+    def _is_stale(self, job_id):
+        # Called from pool threads; dict reads are atomic under the GIL
+        channel = self._channels.get(job_id)
+        return channel is None or (job_id in self._superseding and self._latest.get(channel) != job_id)
+
+    def _take_channel(self, job_id, done):
+        """Channel of a job whose signal should still be delivered, else None"""
+        channel = self._channels.get(job_id)
+        superseding = job_id in self._superseding
+        if done:
+            self._channels.pop(job_id, None)
+            self._superseding.discard(job_id)
+        if channel is None:
+            return None
+        if superseding:
+            if self._latest.get(channel) != job_id:
+                return None
+            if done:
+                del self._latest[channel]
+        return channel
+
+    def _on_progress(self, job_id, status):
+        channel = self._take_channel(job_id, done=False)
+        if channel is not None:
+            self.progress.emit(channel, status)
+
+    def _on_finished(self, job_id, result):
+        channel = self._take_channel(job_id, done=True)
+        if channel is not None:
+            self.finished.emit(channel, result)
+
+    def _on_failed(self, job_id, message):
+        channel = self._take_channel(job_id, done=True)
+        if channel is not None:
+            self.failed.emit(channel, message)
@@ -0,0 +1,111 @@
+"""
+CRT Buddy - Animation
+Frame-coherent CRT motion over a static meme and shared-palette encoding
+"""
+from PIL import Image
+import numpy as np
+from effects.effect_graph import edge3x3, gaussian_blur, FIND_EDGES
+
+
+class CRTAnimator:
+    """Loops a static frame through a scrolling scanline, VHS jitter and
+    a pulsing neon glow
+
+    Everything that does not move is computed once in __init__: the
+    working buffer, its neon glow layer and the per-frame jitter bands.
+    A frame is then one multiply-add of the glow, a row gain for the
+    scanline and a few shifted rows. All motion is periodic in `frames`,
+    so the animation loops seamlessly, and frame(i) is a pure function of
+    i for a given rng.
+    """
+
+    def __init__(self, base, rng, frames=12, glow_radius=5, bar_height=0.12,
+                 bar_gain=0.25, jitter_bands=2, max_shift=8):
+        if frames < 1:
+            raise ValueError(f"frames must be at least 1, got {frames}")
+        self.frames = frames
+        self.base = np.asarray(base.convert('RGB'), dtype=np.float32)
+        height, width = self.base.shape[:2]
+
+        # Neon glow: blurred edges of the static frame, pulsed per frame
+        edges = edge3x3(self.base, FIND_EDGES)
+        self.glow = gaussian_blur(edges, glow_radius) * np.float32(0.5)
+
+        # Scrolling scanline: a bright refresh bar travelling down the frame
+        self.bar_rows = max(2, int(height * bar_height))
+        self.bar_gain = bar_gain
+
+        # VHS jitter: a few horizontally shifted bands per frame
+        self.jitter = []
+        for _ in range(frames):
+            count = int(rng.integers(0, jitter_bands + 1))
+            tops = rng.integers(0, height, count)
+            heights = rng.integers(2, 13, count)
+            shifts = rng.integers(-max_shift, max_shift + 1, count)
+            self.jitter.append(list(zip(tops.tolist(), heights.tolist(), shifts.tolist())))
+
+        self._work = np.empty_like(self.base)
+
+    def __len__(self):
+        return self.frames
+
+    def __iter__(self):
+        for index in range(self.frames):
+            yield self.frame(index)
+
+    def pulse(self, index):
+        """Glow strength of a frame, one full sine cycle per loop"""
+        return 0.6 + 0.4 * np.sin(2 * np.pi * index / self.frames)
+
+    def scanline_gain(self, index):
+        """(H, 1, 1) row gain with the refresh bar at this frame's position"""
+        height = self.base.shape[0]
+        travel = height + self.bar_rows
+        top = int(index * travel / self.frames) - self.bar_rows
+        rows = np.arange(height) - top
+        inside = (rows >= 0) & (rows < self.bar_rows)
+        gain = np.ones(height, dtype=np.float32)
+        profile = np.sin(np.pi * rows[inside] / self.bar_rows)
+        gain[inside] += np.float32(self.bar_gain) * profile.astype(np.float32)
+        return gain[:, None, None]
+
+    def frame(self, index):
+        """RGB Image of one frame"""
+        index %= self.frames
+        buf = self._work
+        np.multiply(self.glow, np.float32(self.pulse(index)), out=buf)
+        buf += self.base
+        buf *= self.scanline_gain(index)
+        np.clip(buf, 0, 255, out=buf)
+        out = buf.astype(np.uint8)
+
+        for top, band, shift in self.jitter[index]:
+            out[top:top + band] = np.roll(out[top:top + band], shift, axis=1)
+
+        return Image.fromarray(out)
+
+
+def shared_palette(frames, colors=256, samples=4):
+    """One adaptive palette for a whole animation
+
+    Built from a few frames spread over the loop, stacked into one image,
+    so colors that only appear mid-animation still get palette entries.
+    """
+    step = max(1, len(frames) // samples)
+    picked = frames[::step][:samples]
+    width, height = picked[0].size
+    sheet = Image.new('RGB', (width, height * len(picked)))
+    for row, frame in enumerate(picked):
+        sheet.paste(frame, (0, row * height))
+    return sheet.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+
+
+def quantize_frames(frames, colors=256):
+    """Map every frame onto one shared palette ('P' mode frames)
+
+    A single palette means a single global color table in GIF and
+    identical indices for unchanged pixels, which is what lets the
+    encoders store only the changed region of each frame.
+    """
+    palette = shared_palette(frames, colors)
+    return [frame.quantize(palette=palette, dither=Image.Dither.NONE) for frame in frames]
@@ -0,0 +1,358 @@
+"""
+CRT Buddy - Effect Graph
+Single-buffer effect pipeline with fused point operations
+"""
+from PIL import Image, ImageFilter
+import numpy as np
+
+
+# ITU-R 601-2 luma weights, same as PIL's convert('L')
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+IDENTITY = np.eye(3, dtype=np.float32)
+
+
+class PointOp:
+    """Per-pixel affine color operation: rgb' = M @ rgb + b
+
+    Point ops are position independent, so any run of them collapses into
+    a single matrix and offset and costs one pass over the buffer.
+    """
+
+    needs_mean = False
+
+    def __init__(self, name, matrix, offset=(0.0, 0.0, 0.0)):
+        self.name = name
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+
+    def affine(self, mean_rgb):
+        """Return (matrix, offset) for an input with the given mean color"""
+        return self.matrix, self.offset
+
+    @classmethod
+    def brightness(cls, factor):
+        """ImageEnhance.Brightness"""
+        return cls('brightness', IDENTITY * factor)
+
+    @classmethod
+    def color(cls, factor):
+        """ImageEnhance.Color (saturation against the luma image)"""
+        gray = np.outer(np.ones(3, dtype=np.float32), LUMA)
+        return cls('color', IDENTITY * factor + gray * (1.0 - factor))
+
+    @classmethod
+    def grayscale(cls):
+        """convert('L') replicated into three channels"""
+        return cls('grayscale', np.outer(np.ones(3, dtype=np.float32), LUMA))
+
+    @classmethod
+    def tint(cls, r=1.0, g=1.0, b=1.0):
+        """Per-channel gain"""
+        return cls('tint', np.diag([r, g, b]))
+
+    @classmethod
+    def contrast(cls, factor):
+        """ImageEnhance.Contrast (scale around the mean luma)"""
+        return ContrastOp(factor)
+
+
+class ContrastOp(PointOp):
+    """Contrast is affine too, but its offset depends on the input mean"""
+
+    needs_mean = True
+
+    def __init__(self, factor):
+        super().__init__('contrast', IDENTITY * factor)
+        self.factor = factor
+
+    def affine(self, mean_rgb):
+        mean = float(np.dot(LUMA, mean_rgb))
+        mean = int(mean + 0.5)
+        return self.matrix, np.full(3, (1.0 - self.factor) * mean, dtype=np.float32)
+
+
+class FusedPointOp:
+    """A run of adjacent PointOps applied in one pass"""
+
+    halo = 0
+    tileable = True
+
+    def __init__(self, ops):
+        self.ops = list(ops)
+        self.name = '+'.join(op.name for op in self.ops)
+        self.needs_mean = any(op.needs_mean for op in self.ops)
+
+    def compose(self, mean_rgb=None):
+        """Collapse the run into one (matrix, offset) pair"""
+        matrix = IDENTITY.copy()
+        offset = np.zeros(3, dtype=np.float32)
+        mean = mean_rgb
+        for op in self.ops:
+            m, b = op.affine(mean)
+            matrix = m @ matrix
+            offset = m @ offset + b
+            if mean is not None:
+                mean = m @ mean + b
+        return matrix, offset
+
+    def __call__(self, buf, ctx):
+        mean_rgb = None
+        if self.needs_mean:
+            # Tiled runs precompute the whole-frame mean
+            mean_rgb = ctx.means.get(id(self))
+            if mean_rgb is None:
+                mean_rgb = mean_color(buf)
+        matrix, offset = self.compose(mean_rgb)
+
+        if (matrix == matrix[0]).all() and (offset == offset[0]).all():
+            # Grayscale result: compute one channel and replicate it
+            gray = buf @ matrix[0]
+            gray += offset[0]
+            np.clip(gray, 0, 255, out=gray)
+            buf[...] = gray[:, :, None]
+            return buf
+        if np.count_nonzero(matrix - np.diag(np.diag(matrix))) == 0:
+            buf *= np.diag(matrix)
+        else:
+            flat = buf.reshape(-1, 3)
+            buf = np.dot(flat, matrix.T).reshape(buf.shape)
+        if offset.any():
+            buf += offset
+
+        # Stage boundary: saturate like the uint8 image the op used to return
+        np.clip(buf, 0, 255, out=buf)
+        return buf
+
+
+class Kernel:
+    """Arbitrary whole-array stage: fn(buf, ctx) -> buf (float32, H x W x 3)
+
+    halo is how many rows of context above and below the kernel reads;
+    kernels that need the whole frame at once set tileable=False. Random
+    kernels must tie their draws to frame rows (ctx.rows) rather than to
+    the buffer, or tiled runs will not match a whole-frame run.
+    """
+
+    needs_mean = False
+
+    def __init__(self, name, fn, halo=0, tileable=True):
+        self.name = name
+        self.fn = fn
+        self.halo = halo
+        self.tileable = tileable
+
+    def __call__(self, buf, ctx):
+        return self.fn(buf, ctx)
+
+
+class FrameContext:
+    """Where the working buffer sits in the full frame
+
+    y0 is the frame row of buf[0] and height the full frame height, so
+    row-dependent kernels (scanlines, gradients) line up across tiles.
+    state is scratch space shared by every tile of one frame.
+    """
+
+    def __init__(self, y0=0, height=None, state=None, means=None):
+        self.y0 = y0
+        self.height = height
+        self.state = {} if state is None else state
+        self.means = {} if means is None else means
+
+    def rows(self, buf):
+        """Frame rows covered by buf"""
+        return slice(self.y0, self.y0 + buf.shape[0])
+
+
+class EffectPipeline:
+    """Composable effect graph running on one float32 working buffer
+
+    The input is converted to float32 once, every stage works on that
+    buffer, and a PIL Image is only materialized at the very end.
+    """
+
+    def __init__(self, stages):
+        self.stages = self._fuse(stages)
+
+    @staticmethod
+    def _fuse(stages):
+        """Merge adjacent PointOps into FusedPointOps"""
+        fused = []
+        run = []
+        for stage in stages:
+            if isinstance(stage, PointOp):
+                run.append(stage)
+                continue
+            if run:
+                fused.append(FusedPointOp(run))
+                run = []
+            fused.append(stage)
+        if run:
+            fused.append(FusedPointOp(run))
+        return fused
+
+    def __repr__(self):
+        names = ' -> '.join(stage.name for stage in self.stages)
+        return f"EffectPipeline({names})"
+
+    @property
+    def halo(self):
+        """Rows of context a tile needs on each side for an exact result"""
+        return sum(stage.halo for stage in self.stages)
+
+    @property
+    def tileable(self):
+        return all(stage.tileable for stage in self.stages)
+
+    def run_array(self, arr, ctx=None):
+        """Run on an RGB uint8 array, returning the float32 working buffer"""
+        buf = np.asarray(arr, dtype=np.float32)
+        if buf is arr:
+            buf = buf.copy()
+        if ctx is None:
+            ctx = FrameContext(0, buf.shape[0])
+        for stage in self.stages:
+            buf = stage(buf, ctx)
+        return buf
+
+    def run(self, img):
+        """Run on a PIL Image and return a new RGB Image"""
+        buf = self.run_array(np.asarray(img.convert('RGB')))
+        return to_image(buf)
+
+    __call__ = run
+
+    def run_tiled(self, img, tile_height=512):
+        """Run in horizontal bands so float32 memory is bounded by the tile
+
+        Each band is extended by the pipeline's halo so blur and edge
+        kernels see the same neighbourhood as in a whole-frame run; only
+        the band itself is written to the output. Working memory is
+        roughly (tile_height + 2 * halo) * width * 12 bytes per live
+        buffer, independent of the image height.
+        """
+        if not self.tileable:
+            raise ValueError(f"{self!r} has stages that need the whole frame")
+
+        width, height = img.size
+        state = {}
+        means = self._frame_means(img, tile_height, state)
+        result = Image.new('RGB', (width, height))
+
+        for y0, y1, top, tile in self._tiles(img, tile_height, self.halo):
+            ctx = FrameContext(top, height, state, means)
+            buf = self.run_array(tile, ctx)
+            result.paste(to_image(buf[y0 - top:y1 - top]), (0, y0))
+
+        return result
+
+    def _tiles(self, img, tile_height, halo):
+        """Yield (y0, y1, top, uint8 array of rows top..y1+halo)"""
+        width, height = img.size
+        for y0 in range(0, height, tile_height):
+            y1 = min(height, y0 + tile_height)
+            top = max(0, y0 - halo)
+            bottom = min(height, y1 + halo)
+            tile = img.crop((0, top, width, bottom))
+            if tile.mode != 'RGB':
+                tile = tile.convert('RGB')
+            yield y0, y1, top, np.asarray(tile)
+
+    def _frame_means(self, img, tile_height, state):
+        """Whole-frame mean color at the input of each mean-dependent stage
+
+        Contrast needs a global statistic, so for every such stage the
+        stages before it are run band by band once to accumulate it.
+        """
+        means = {}
+        width, height = img.size
+        for index, stage in enumerate(self.stages):
+            if not stage.needs_mean:
+                continue
+            prefix = EffectPipeline([])
+            prefix.stages = self.stages[:index]
+            total = np.zeros(3, dtype=np.float64)
+            for y0, y1, top, tile in self._tiles(img, tile_height, prefix.halo):
+                ctx = FrameContext(top, height, state, means)
+                buf = prefix.run_array(tile, ctx)[y0 - top:y1 - top]
+                total += buf.sum(axis=0).sum(axis=0)
+            means[id(stage)] = (total / (width * height)).astype(np.float32)
+        return means
+
+
+def mean_color(buf):
+    """Mean RGB of a working buffer (row sums first, much faster than axis=(0, 1))"""
+    height, width = buf.shape[:2]
+    return buf.sum(axis=0).sum(axis=0) / (height * width)
+
+
+def to_image(buf):
+    """Materialize a float32 working buffer as an RGB Image"""
+    np.clip(buf, 0, 255, out=buf)
+    return Image.fromarray(buf.astype(np.uint8))
+
+
+# ---------------------------------------------------------------------------
+# Array kernels
+# ---------------------------------------------------------------------------
+
+def blur3(buf, sigma=0.5):
+    """Separable 3-tap Gaussian blur, edges replicated"""
+    w = np.float32(np.exp(-1.0 / (2.0 * sigma * sigma)))
+    side, center = w / (1 + 2 * w), 1 / (1 + 2 * w)
+
+    out = buf * center
+    out[1:] += buf[:-1] * side
+    out[:-1] += buf[1:] * side
+    out[0] += buf[0] * side
+    out[-1] += buf[-1] * side
+
+    buf = out * center
+    buf[:, 1:] += out[:, :-1] * side
+    buf[:, :-1] += out[:, 1:] * side
+    buf[:, 0] += out[:, 0] * side
+    buf[:, -1] += out[:, -1] * side
+    return buf
+
+
+def gaussian_halo(radius):
+    """Rows of context gaussian_blur reads on each side"""
+    return int(np.ceil(3 * radius))
+
+
+def gaussian_blur(buf, radius):
+    """Gaussian blur of a 0..255 layer using PIL's C box-blur implementation
+
+    Meant for side layers (glow, shadow) that are already saturated, so
+    the uint8 round trip only costs rounding.
+    """
+    layer = np.clip(buf, 0, 255).astype(np.uint8)
+    if layer.ndim == 3 and layer.shape[2] == 1:
+        layer = layer[:, :, 0]
+    blurred = Image.fromarray(layer).filter(ImageFilter.GaussianBlur(radius))
+    return np.asarray(blurred, dtype=np.float32).reshape(buf.shape)
+
+
+def edge3x3(buf, center):
+    """3x3 kernel with -1 neighbours and the given center weight
+
+    Covers ImageFilter.FIND_EDGES (8) and EDGE_ENHANCE_MORE (9) via a
+    separable box sum instead of nine shifted multiply-adds.
+    """
+    h, w = buf.shape[:2]
+    padded = np.pad(buf, [(1, 1), (1, 1)] + [(0, 0)] * (buf.ndim - 2), mode='edge')
+
+    rows = padded[:-2] + padded[1:-1]
+    rows += padded[2:]
+    box = rows[:, :-2] + rows[:, 1:-1]
+    box += rows[:, 2:]
+
+    out = buf * np.float32(center + 1)
+    out -= box
+    np.clip(out, 0, 255, out=out)
+    return out
+
+
+# Center weights of PIL's built-in edge kernels
+FIND_EDGES = 8
+EDGE_ENHANCE_MORE = 9
@@ -0,0 +1,104 @@
+"""
+CRT Buddy - Font Registry
+Resolves font files once and caches loaded fonts by (path, size)
+"""
+from functools import lru_cache
+from PIL import ImageFont
+import os
+import shutil
+import subprocess
+import sys
+
+
+# Bundled pixel fonts, by short name
+BUNDLED_FONTS = {
+    'dinkie-7px': 'DinkieBitmap-7px.ttf',
+    'dinkie-9px': 'DinkieBitmap-9px.ttf',
+    'dinkie-7px-code': 'DinkieBitmap-7pxCode.ttf',
+    'dinkie-9px-code': 'DinkieBitmap-9pxCode.ttf',
+}
+
+# Tried in order when no font name is given
+DEFAULT_FONTS = ('arial.ttf', 'Arial', 'dinkie-9px')
+
+
+def _bundled_font_dirs():
+    """Where the DinkieBitmap TTFs live (source tree or frozen build)"""
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return [
+        os.path.join(base_path, "DinkieBitmap-v1.5.0-KeDingKeMao", "ttf"),
+        os.path.join(base_path, "..", "..", "DinkieBitmap-v1.5.0-KeDingKeMao", "ttf"),
+        os.path.join(os.getcwd(), "..", "DinkieBitmap-v1.5.0-KeDingKeMao", "ttf"),
+        os.path.join(os.getcwd(), "DinkieBitmap-v1.5.0-KeDingKeMao", "ttf"),
+    ]
+
+
+def _fontconfig_lookup(name):
+    """Font file fontconfig would use for a family name, or None"""
+    if not shutil.which('fc-match'):
+        return None
+    try:
+        result = subprocess.run(['fc-match', '-f', '%{file}', name],
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    path = result.stdout.strip()
+    if result.returncode == 0 and path and os.path.exists(path):
+        return path
+    return None
+
+
+@lru_cache(maxsize=None)
+def resolve_font(name):
+    """Font file path for a name, or None if it cannot be found
+
+    name may be a path, a file name PIL can find in the system font
+    directories (e.g. 'arial.ttf'), a bundled font ('dinkie-9px') or a
+    family name for fontconfig ('DejaVu Sans'). Resolved once per name.
+    """
+    if name in BUNDLED_FONTS:
+        for font_dir in _bundled_font_dirs():
+            path = os.path.abspath(os.path.join(font_dir, BUNDLED_FONTS[name]))
+            if os.path.exists(path):
+                return path
+        return None
+
+    if os.path.exists(name):
+        return os.path.abspath(name)
+
+    # PIL searches the Windows and XDG font directories for bare file names
+    try:
+        return ImageFont.truetype(name, 10).path
+    except OSError:
+        pass
+
+    return _fontconfig_lookup(name)
+
+
+@lru_cache(maxsize=64)
+def load_font(path, size):
+    """FreeTypeFont for a resolved path, cached by (path, size)"""
+    return ImageFont.truetype(path, size)
+
+
+def get_font(size, name=None):
+    """Cached font of the given pixel size
+
+    Falls back through DEFAULT_FONTS and finally PIL's built-in font, so
+    callers always get something that can draw text.
+    """
+    size = max(1, int(size))
+    for candidate in ((name,) if name else ()) + DEFAULT_FONTS:
+        path = resolve_font(candidate)
+        if path:
+            return load_font(path, size)
+    return _default_font(size)
+
+
+@lru_cache(maxsize=16)
+def _default_font(size):
+    return ImageFont.load_default(size)
+
@@ -0,0 +1,262 @@
+"""
+CRT Buddy - Realtime Effects
+Integer array kernels of the Y2K effects for live video frames
+"""
+from PIL import Image, ImageFilter
+import numpy as np
+from effects.effect_graph import LUMA
+from effects.y2k_styles import _holographic_overlay
+
+
+# Luma weights in 8-bit fixed point (sum to 256)
+_LUMA_FIXED = np.array([77, 150, 29], dtype=np.uint16)
+
+
+class RealtimeStyles:
+    """Y2K effects for streams of same-size uint8 frames
+
+    Every effect takes and returns an (H, W, 3) RGB uint8 array. The look
+    follows Y2KStyles, but the kernels work in 8/16-bit integers on the
+    flattened frame (neighbours are plain offsets, so every pass is one
+    contiguous vector operation), per-size tables (scanline rainbow,
+    pixel grid, noise) are built once, and neon's glow is blurred at
+    quarter resolution. Results are close to, not bit-identical with, the
+    still effects, including on saturated input (white frames, hard
+    black/white edges), where every integer intermediate stays in range;
+    test.py compares both on such a frame.
+    """
+
+    EFFECTS = ('crt', 'vhs', 'holographic', 'chrome', 'neon', 'pixelate')
+
+    def __init__(self, seed=None, noise_frames=8):
+        self.rng = np.random.default_rng(seed)
+        self.noise_frames = noise_frames
+        self._cache = {}
+
+    def apply(self, frame, effect_name):
+        """Run one effect on a frame (unknown names fall back to crt)"""
+        if effect_name not in self.EFFECTS:
+            effect_name = 'crt'
+        return getattr(self, effect_name)(frame)
+
+    # ------------------------------------------------------------------
+    # Effects
+    # ------------------------------------------------------------------
+
+    def crt(self, frame, spacing=3, intensity=50):
+        """RGB shift, darkened scanlines and a slight blur"""
+        out = frame.copy()
+
+        # RGB shift
+        out[:, 2:, 0] = frame[:, :-2, 0]  # Red shift
+        out[:, :-2, 2] = frame[:, 2:, 2]  # Blue shift
+
+        # Darken scanlines: x * (255 - intensity) / 255 on every spacing-th row
+        rows = out[::spacing].astype(np.uint16)
+        rows *= 255 - intensity
+        rows += 127
+        out[::spacing] = rows // 255
+
+        # Slight blur
+        return self._blur3(out)
+
+    def vhs(self, frame, noise_level=20):
+        """Glitch bands, saturation boost and tape noise"""
+        height, width = frame.shape[:2]
+        out = frame.copy()
+
+        # Horizontal displacement bands
+        count = self.rng.integers(3, 9)
+        tops = self.rng.integers(0, max(0, height - 50) + 1, count)
+        heights = self.rng.integers(5, 31, count)
+        shifts = self.rng.integers(-20, 21, count)
+        for top, h, shift in zip(tops, heights, shifts):
+            # Pixels shifted in from outside keep their original value
+            band = out[top:top + h]
+            if shift > 0:
+                band[:, shift:] = band[:, :-shift].copy()
+            elif shift < 0:
+                band[:, :shift] = band[:, -shift:].copy()
+
+        # Color distortion
+        out = self._saturate(out, 1.3)
+
+        # Noise: a random window into a pre-drawn noise bank
+        bank = self._noise_bank(frame.shape, noise_level)
+        start = self.rng.integers(0, bank.size - out.size + 1)
+        noisy = out.astype(np.int16).ravel()
+        noisy += bank[start:start + out.size]
+        np.clip(noisy, 0, 255, out=noisy)
+        return noisy.astype(np.uint8).reshape(frame.shape)
+
+    def holographic(self, frame, alpha=0.3, gain=1.2):
+        """Rainbow gradient blend, brightened"""
+        overlay = self._table(('holo', frame.shape[0], alpha, gain), lambda: np.rint(
+            _holographic_overlay(frame.shape[0], alpha, gain)).astype(np.uint16))
+
+        scale = int(round((1.0 - alpha) * gain * 256))
+        out = frame.astype(np.uint16)
+        out *= scale
+        out >>= 8
+        out += overlay
+        np.minimum(out, 255, out=out)
+        return out.astype(np.uint8)
+
+    def chrome(self, frame):
+        """Grayscale, contrast 2.0, edge enhance, silver tint"""
+        gray = self._luma(frame)
+
+        # Contrast around the mean luma
+        mean = int(gray.mean() + 0.5)
+        gray = gray.astype(np.int16)
+        gray *= 2
+        gray -= mean
+        np.clip(gray, 0, 255, out=gray)
+
+        # EDGE_ENHANCE_MORE on the single gray channel: 10 * x - box3x3(x)
+        edges = gray * np.int16(10)
+        edges -= self._box3(gray, 1)
+        np.clip(edges, 0, 255, out=edges)
+
+        # Silver tint
+        out = np.empty(frame.shape, dtype=np.uint8)
+        tinted = edges + (edges + 5) // 10
+        np.minimum(tinted, 255, out=tinted)
+        out[:, :, 0] = tinted
+        out[:, :, 1] = edges
+        out[:, :, 2] = tinted
+        return out
+
+    def neon(self, frame, glow_radius=5):
+        """Saturated colors plus a blurred edge glow, brightened"""
+        vivid = self._saturate(frame, 2.0)
+
+        # FIND_EDGES: 9 * x - box3x3(x), on all three channels
+        wide = vivid.astype(np.int16)
+        edges = wide * np.int16(9)
+        edges -= self._box3(wide, 3)
+        np.clip(edges, 0, 255, out=edges)
+
+        # Glow at quarter resolution: the blur is low frequency anyway
+        height, width = frame.shape[:2]
+        small = Image.fromarray(edges.astype(np.uint8)).reduce(4)
+        small = small.filter(ImageFilter.GaussianBlur(glow_radius / 4))
+        glow = np.asarray(small.resize((width, height), Image.Resampling.BILINEAR))
+
+        # (0.5 * vivid + 0.5 * glow) * 1.3 as (vivid + glow) * 83 / 128; the
+        # sum is at most 510, so the product (<= 42330) still fits in uint16
+        out = vivid.astype(np.uint16)
+        out += glow
+        out *= 83
+        out >>= 7
+        np.minimum(out, 255, out=out)
+        return out.astype(np.uint8)
+
+    def pixelate(self, frame, pixel_size=8, colors=32):
+        """Block pixels and a reduced palette"""
+        height, width = frame.shape[:2]
+        small_h = max(1, height // pixel_size)
+        small_w = max(1, width // pixel_size)
+
+        # Shrink (nearest sampling at pixel centers)
+        rows, cols = self._table(('pixel_grid', height, width, pixel_size), lambda: (
+            ((np.arange(small_h) + 0.5) * height / small_h).astype(np.intp),
+            ((np.arange(small_w) + 0.5) * width / small_w).astype(np.intp)))
+        small = Image.fromarray(frame[rows[:, None], cols])
+
+        # Reduce colors on the small image
+        small = small.convert('P', palette=Image.Palette.ADAPTIVE, colors=colors)
+
+        # Enlarge back
+        return np.asarray(small.convert('RGB').resize((width, height), Image.Resampling.NEAREST))
+
+    # ------------------------------------------------------------------
+    # Kernels
+    # ------------------------------------------------------------------
+
+    def _blur3(self, frame):
+        """Separable [27, 202, 27] / 256 blur (blur3's sigma 0.5 taps in 8-bit
+        fixed point), rounded after each pass, edges replicated"""
+        height, width, channels = frame.shape
+        row = width * channels
+        flat = frame.astype(np.uint16).ravel()
+
+        # Horizontal: neighbours are channels apart in the flat frame
+        side = flat * np.uint16(27)
+        out = flat * np.uint16(202)
+        out[channels:] += side[:-channels]
+        out[:-channels] += side[channels:]
+        self._fix_columns(out, side, height, row, channels)
+        out += 128
+        out >>= 8
+
+        # Vertical: neighbours are a row apart
+        side = out * np.uint16(27)
+        out *= 202
+        out[row:] += side[:-row]
+        out[:-row] += side[row:]
+        out[:row] += side[:row]
+        out[-row:] += side[-row:]
+        out += 128
+        out >>= 8
+        return out.astype(np.uint8).reshape(frame.shape)
+
+    @staticmethod
+    def _fix_columns(out, flat, height, row, channels):
+        """Undo the row wrap-around of a flat horizontal pass (replicate edges)"""
+        grid = out.reshape(height, row)
+        src = flat.reshape(height, row)
+        # First column picked up the previous row's last pixel, and vice versa
+        grid[1:, :channels] -= src[:-1, -channels:]
+        grid[:-1, -channels:] -= src[1:, :channels]
+        grid[:, :channels] += src[:, :channels]
+        grid[:, -channels:] += src[:, -channels:]
+
+    def _box3(self, arr, channels):
+        """3x3 box sum of an int16 (H, W[, C]) array, edges replicated"""
+        shape = arr.shape
+        height, width = shape[:2]
+        row = width * channels
+        flat = arr.ravel()
+
+        rows = flat.copy()
+        rows[channels:] += flat[:-channels]
+        rows[:-channels] += flat[channels:]
+        self._fix_columns(rows, flat, height, row, channels)
+
+        box = rows.copy()
+        box[row:] += rows[:-row]
+        box[:-row] += rows[row:]
+        box[:row] += rows[:row]
+        box[-row:] += rows[-row:]
+        return box.reshape(shape)
+
+    def _saturate(self, frame, factor):
+        """ImageEnhance.Color: blend with the luma image (C matrix convert)"""
+        matrix = np.eye(3, dtype=np.float32) * factor + np.outer(np.ones(3), LUMA) * (1 - factor)
+        coeffs = tuple(float(v) for r in matrix for v in (*r, 0.0))
+        return np.asarray(Image.fromarray(frame).convert('RGB', coeffs))
+
+    @staticmethod
+    def _luma(frame):
+        """convert('L') in fixed point"""
+        wide = frame.astype(np.uint16)
+        gray = wide[:, :, 0] * _LUMA_FIXED[0]
+        gray += wide[:, :, 1] * _LUMA_FIXED[1]
+        gray += wide[:, :, 2] * _LUMA_FIXED[2]
+        gray += 128
+        gray >>= 8
+        return gray
+
+    def _noise_bank(self, shape, noise_level):
+        """int16 noise longer than one frame, windowed at random per frame"""
+        size = int(np.prod(shape))
+        return self._table(('noise', size, noise_level), lambda: self.rng.integers(
+            -noise_level, noise_level, size * 2 + self.noise_frames * 4099, dtype=np.int16))
+
+    def _table(self, key, build):
+        """Per-size table, built on first use"""
+        table = self._cache.get(key)
+        if table is None:
+            table = self._cache[key] = build()
+        return table
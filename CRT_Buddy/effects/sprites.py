@@ -0,0 +1,131 @@
+"""
+CRT Buddy - Decoration Sprites
+Pre-rendered star, sparkle and glitter sprites stamped in batches
+"""
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFilter
+import numpy as np
+
+
+SPRITE_KINDS = ('star', 'sparkle', 'glitter')
+
+# Pre-rendered diameters in pixels per kind; few sizes keep the batches large
+SPRITE_SIZES = {
+    'star': (7, 11, 15),
+    'sparkle': (9, 15, 21),
+    'glitter': (2, 3, 4, 5),
+}
+
+# Supersampling factor for the anti-aliased shapes
+_SUPERSAMPLE = 4
+
+
+@lru_cache(maxsize=64)
+def sprite_mask(kind, size):
+    """Cached alpha footprint of a sprite as (dy, dx, alpha) arrays
+
+    Only pixels with non-zero alpha are kept, so stamping writes exactly
+    the sprite's shape. Offsets are relative to the sprite's center.
+    """
+    mask = np.asarray(_draw_sprite(kind, size))
+    dy, dx = np.nonzero(mask)
+    alpha = mask[dy, dx]
+    center = mask.shape[0] // 2
+    footprint = (dy - center, dx - center, alpha)
+    for array in footprint:
+        array.setflags(write=False)
+    return footprint
+
+
+def _draw_sprite(kind, size):
+    """'L' image of one sprite, size x size (size + 1 for glitter)"""
+    if kind == 'glitter':
+        # Same dot the old ellipse decorations drew, hard edged
+        mask = Image.new('L', (size + 1, size + 1), 0)
+        ImageDraw.Draw(mask).ellipse([0, 0, size, size], fill=255)
+        return mask
+
+    big = size * _SUPERSAMPLE
+    mask = Image.new('L', (big, big), 0)
+    draw = ImageDraw.Draw(mask)
+    c = big / 2
+
+    if kind == 'star':
+        # Four-pointed star: long points on the axes, pinched waist
+        waist = big * 0.12
+        points = [(c, 0), (c + waist, c - waist), (big, c), (c + waist, c + waist),
+                  (c, big), (c - waist, c + waist), (0, c), (c - waist, c - waist)]
+        draw.polygon(points, fill=255)
+    elif kind == 'sparkle':
+        # Thin cross over a soft glow
+        draw.ellipse([c - big * 0.2, c - big * 0.2, c + big * 0.2, c + big * 0.2], fill=140)
+        mask = mask.filter(ImageFilter.GaussianBlur(big * 0.08))
+        draw = ImageDraw.Draw(mask)
+        arm = max(1, _SUPERSAMPLE // 2)
+        draw.rectangle([c - arm, 0, c + arm, big], fill=255)
+        draw.rectangle([0, c - arm, big, c + arm], fill=255)
+    else:
+        raise ValueError(f"Unknown sprite: {kind}")
+
+    return mask.resize((size, size), Image.Resampling.BOX)
+
+
+def stamp_sprites(img, kinds, sizes, centers, colors):
+    """Stamp sprites onto img in place with one composite
+
+    kinds, sizes, centers (N, 2) x/y and colors (N, 3) describe one sprite
+    each. The pixels of all sprites sharing a (kind, size) footprint are
+    gathered with one fancy index, so the cost grows with the number of
+    distinct footprints and covered pixels, not the number of sprites.
+    Where sprites overlap, one replaces the other rather than blending.
+    """
+    width, height = img.size
+    kinds = np.asarray(kinds)
+    sizes = np.asarray(sizes)
+    centers = np.asarray(centers, dtype=np.intp).reshape(-1, 2)
+    colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+    if len(centers) == 0:
+        return img
+
+    rows, cols, rgb, alpha = [], [], [], []
+    for kind, size in sorted(set(zip(kinds.tolist(), sizes.tolist()))):
+        members = np.nonzero((kinds == kind) & (sizes == size))[0]
+        dy, dx, a = sprite_mask(kind, size)
+        rows.append((centers[members, 1, None] + dy).ravel())
+        cols.append((centers[members, 0, None] + dx).ravel())
+        rgb.append(np.repeat(colors[members], len(a), axis=0))
+        alpha.append(np.tile(a, len(members)))
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    rgb, alpha = np.concatenate(rgb), np.concatenate(alpha)
+
+    # Sprites may hang off the edges
+    inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    rows, cols, rgb, alpha = rows[inside], cols[inside], rgb[inside], alpha[inside]
+
+    # One RGBA layer, composited with a single masked paste
+    layer = np.zeros((height, width, 4), dtype=np.uint8)
+    layer[rows, cols, :3] = rgb
+    layer[rows, cols, 3] = alpha
+    layer = Image.fromarray(layer)
+    img.paste(layer, (0, 0), layer)
+    return img
+
+
+def scatter_sprites(img, count, rng, colors, kinds=SPRITE_KINDS):
+    """Stamp count random sprites of the given kinds and colors onto img"""
+    if count <= 0:
+        return img
+    width, height = img.size
+
+    # One row of sizes per kind, padded by repeating (uniform per kind)
+    columns = max(len(SPRITE_SIZES[kind]) for kind in kinds)
+    size_table = np.array([np.resize(SPRITE_SIZES[kind], columns) for kind in kinds])
+    kind_index = rng.integers(0, len(kinds), count)
+    sizes = size_table[kind_index, rng.integers(0, columns, count)]
+    centers = np.stack([rng.integers(0, width + 1, count),
+                        rng.integers(0, height + 1, count)], axis=1)
+    palette = np.asarray(colors, dtype=np.uint8)
+    color_index = rng.integers(0, len(palette), count)
+
+    return stamp_sprites(img, np.asarray(kinds)[kind_index], sizes, centers,
+                         palette[color_index])
@@ -2,13 +2,21 @@
 CRT Buddy - Text Effects
 Y2K style text rendering effects
 """
-from PIL import Image, ImageDraw, ImageFont
-import random
+from effects.fonts import get_font
+from effects.text_layers import GlyphMaskCache, stripe_colors, vertical_gradient, paint
 
 
 class TextEffects:
     """Y2K style text effects"""
     
+    STYLES = ('gradient', 'glitch', 'neon', 'chrome', 'retro')
+    
+    def __init__(self, font_name=None, mask_cache_size=128):
+        # None tries arial, then fontconfig, then the bundled pixel font
+        self.font_name = font_name
+        # Laid-out captions (and their glows) are reused across memes
+        self.mask_cache = GlyphMaskCache(mask_cache_size)
+    
     def apply_effect(self, img, text, style):
         """Apply specified text effect"""
         effects = {
@@ -24,154 +32,57 @@ class TextEffects:
     
     def gradient_text(self, img, text):
         """Gradient text effect"""
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
-        
-        # Get font
-        try:
-            font_size = min(width, height) // 8
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-        
-        # Get text size
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Position
-        x = (width - text_width) // 2
-        y = (height - text_height) // 2
-        
-        # Draw each character with different color
         colors = [(255, 0, 255), (0, 255, 255), (255, 255, 0), (0, 255, 0)]
-        char_x = x
-        
-        for i, char in enumerate(text):
-            color = colors[i % len(colors)]
-            draw.text((char_x, y), char, fill=color, font=font)
-            char_bbox = draw.textbbox((char_x, y), char, font=font)
-            char_x += char_bbox[2] - char_bbox[0]
-        
-        return img
+        return self._striped_text(img, text, colors)
     
     def glitch_text(self, img, text):
         """Glitch/RGB split text effect"""
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
-        
-        # Get font
-        try:
-            font_size = min(width, height) // 8
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-        
-        # Get text size
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Position
-        x = (width - text_width) // 2
-        y = (height - text_height) // 2
+        text_mask, x, y = self._centered_mask(img, text)
         
         # Draw RGB layers with offsets
         offsets = [(0, -3), (3, 0), (-3, 3)]
         colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
         
         for offset, color in zip(offsets, colors):
-            draw.text((x + offset[0], y + offset[1]), text, fill=color, font=font)
+            paint(img, text_mask, text_mask.origin(x + offset[0], y + offset[1]), color)
         
         return img
     
     def neon_text(self, img, text):
         """Neon glow text effect"""
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
-        
-        # Get font
-        try:
-            font_size = min(width, height) // 8
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-        
-        # Get text size
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Position
-        x = (width - text_width) // 2
-        y = (height - text_height) // 2
+        text_mask, x, y = self._centered_mask(img, text)
+        font = self._font(img)
         
-        # Draw glow layers
-        glow_color = (255, 0, 255)
-        for i in range(10, 0, -2):
-            alpha = int(255 * (i / 10))
-            draw.text((x, y), text, fill=glow_color + (alpha,), font=font)
+        # Glow: the blurred glyph mask in the glow color
+        radius = max(2, text_mask.size[1] // 6)
+        glow = self.mask_cache.get(text, font, ('blurred', radius, 2.0))
+        paint(img, glow, glow.origin(x, y), (255, 0, 255))
         
         # Draw main text
-        draw.text((x, y), text, fill=(255, 255, 255), font=font)
+        paint(img, text_mask, text_mask.origin(x, y), (255, 255, 255))
         
         return img
     
     def chrome_text(self, img, text):
         """Chrome/metallic text effect"""
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
-        
-        # Get font
-        try:
-            font_size = min(width, height) // 8
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-        
-        # Get text size
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Position
-        x = (width - text_width) // 2
-        y = (height - text_height) // 2
+        text_mask, x, y = self._centered_mask(img, text)
+        font = self._font(img)
         
         # Draw shadow
-        draw.text((x + 5, y + 5), text, fill=(0, 0, 0), font=font)
+        paint(img, text_mask, text_mask.origin(x + 5, y + 5), (0, 0, 0))
         
-        # Draw gradient
-        for i in range(0, text_height, 2):
-            shade = int(128 + 127 * (i / text_height))
-            draw.text((x, y + i), text, fill=(shade, shade, shade + 50), font=font)
+        # Draw gradient: vertical metal ramp through the glyph mask
+        ramp = vertical_gradient(text_mask.size[1], (128, 128, 178), (255, 255, 255))
+        paint(img, text_mask, text_mask.origin(x, y), ramp)
         
         # Draw highlight
-        draw.text((x - 1, y - 1), text, fill=(255, 255, 255, 100), font=font)
+        highlight = self.mask_cache.get(text, font, ('scaled', 100 / 255))
+        paint(img, highlight, highlight.origin(x - 1, y - 1), (255, 255, 255))
         
         return img
     
     def retro_text(self, img, text):
         """Retro rainbow text effect"""
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
-        
-        # Get font
-        try:
-            font_size = min(width, height) // 8
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-        
-        # Get text size
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Position
-        x = (width - text_width) // 2
-        y = (height - text_height) // 2
-        
         # Rainbow colors
         colors = [
             (255, 0, 0),    # Red
@@ -182,13 +93,38 @@ class TextEffects:
             (75, 0, 130),   # Indigo
             (148, 0, 211)   # Violet
         ]
+        return self._striped_text(img, text, colors)
+    
+    def _striped_text(self, img, text, colors):
+        """Centered text with each character in the next color
+        
+        The string is laid out once into a mask, and the per-character
+        colors are a column stripe composited through it.
+        """
+        text_mask, x, y = self._centered_mask(img, text)
+        paint(img, text_mask, text_mask.origin(x, y), stripe_colors(text_mask, colors))
+        return img
+    
+    def cache_stats(self):
+        """Glyph mask cache hits/misses, for tuning mask_cache_size"""
+        return self.mask_cache.stats()
+    
+    def _font(self, img):
+        """Caption font scaled to the image"""
+        width, height = img.size
+        return get_font(min(width, height) // 8, self.font_name)
+    
+    def _centered_mask(self, img, text):
+        """Glyph mask of text and the draw position that centers it"""
+        width, height = img.size
         
-        # Draw each character with rainbow colors
-        char_x = x
-        for i, char in enumerate(text):
-            color = colors[i % len(colors)]
-            draw.text((char_x, y), char, fill=color, font=font)
-            char_bbox = draw.textbbox((char_x, y), char, font=font)
-            char_x += char_bbox[2] - char_bbox[0]
+        # Lay out the whole string once (or reuse the cached layout)
+        text_mask = self.mask_cache.get(text, self._font(img))
+        text_width = text_mask.bbox[2]
+        text_height = text_mask.bbox[3]
         
-        return img
+        # Position
+        x = (width - text_width) // 2
+        y = (height - text_height) // 2
+        
+        return text_mask, x, y
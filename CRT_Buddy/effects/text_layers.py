@@ -0,0 +1,228 @@
+"""
+CRT Buddy - Text Layers
+Lay a caption out once as a glyph mask and composite colors through it
+"""
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFilter
+import numpy as np
+import threading
+
+
+class TextMask:
+    """Coverage mask of a whole (possibly multi-line) string
+
+    mask is an (h, w) uint8 array; bbox is its box relative to the point
+    the text would be drawn at with ImageDraw.text. lines holds one
+    (row, columns) pair per text line: row is where that line's band
+    starts within the mask and columns[i] is the x offset where its
+    character i starts.
+    """
+
+    def __init__(self, mask, bbox, lines):
+        self.mask = mask
+        self.bbox = bbox
+        self.lines = lines
+
+    @property
+    def size(self):
+        return self.mask.shape[1], self.mask.shape[0]
+
+    def origin(self, x, y):
+        """Top-left of the mask when the text is drawn at (x, y)"""
+        return x + self.bbox[0], y + self.bbox[1]
+
+    def scaled(self, opacity):
+        """Same coverage at a fraction of the opacity"""
+        mask = (self.mask * np.float32(opacity)).astype(np.uint8)
+        return TextMask(mask, self.bbox, self.lines)
+
+    def blurred(self, radius, strength=1.0):
+        """Gaussian-blurred coverage (a glow), grown to fit the blur
+
+        strength > 1 brightens the halo before it is clipped to full
+        coverage.
+        """
+        margin = int(np.ceil(3 * radius))
+        padded = np.pad(self.mask, margin)
+        glow = Image.fromarray(padded).filter(ImageFilter.GaussianBlur(radius))
+        glow = np.asarray(glow, dtype=np.float32)
+        if strength != 1.0:
+            glow = np.minimum(glow * strength, 255)
+        left, top, right, bottom = self.bbox
+        bbox = (left - margin, top - margin, right + margin, bottom + margin)
+        # The first band still starts at the top of the grown mask
+        lines = [(row + margin if i else 0, columns + margin)
+                 for i, (row, columns) in enumerate(self.lines)]
+        return TextMask(glow.astype(np.uint8), bbox, lines)
+
+
+def render_text_mask(text, font, spacing=4):
+    """Lay the whole string out once (with kerning) and return a TextMask
+
+    Lines split on newlines are stacked left-aligned with the same
+    spacing ImageDraw.multiline_text uses.
+    """
+    texts = text.split('\n')
+    line_height = font.getbbox('A')[3] + spacing
+    boxes = [font.getbbox(line) for line in texts]
+    inked = [(box[0], box[1] + i * line_height, box[2], box[3] + i * line_height)
+             for i, (line, box) in enumerate(zip(texts, boxes)) if line]
+    if inked:
+        bbox = (min(b[0] for b in inked), min(b[1] for b in inked),
+                max(b[2] for b in inked), max(b[3] for b in inked))
+    else:
+        bbox = (0, 0, 0, 0)
+    width = max(1, bbox[2] - bbox[0])
+    height = max(1, bbox[3] - bbox[1])
+
+    mask = Image.new('L', (width, height), 0)
+    draw = ImageDraw.Draw(mask)
+    lines = []
+    for i, line in enumerate(texts):
+        top = i * line_height - bbox[1]
+        if line:
+            draw.text((-bbox[0], top), line, fill=255, font=font)
+        lines.append((max(0, top) if i else 0, _glyph_columns(line, font, bbox[0])))
+
+    return TextMask(np.asarray(mask), bbox, lines)
+
+
+class GlyphMaskCache:
+    """Bounded LRU of TextMasks keyed by (text, font, size, style)
+
+    style 'plain' is the laid-out string; derived styles are tuples naming
+    a TextMask method and its arguments, e.g. ('blurred', 8, 2.0) or
+    ('scaled', 0.4), and are built from the cached plain mask. Cached
+    masks are read-only and shared, so a repeated caption costs a
+    composite and no FreeType layout. maxsize=0 disables caching.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text, font, style='plain'):
+        return self._get(text, font, style, True)
+
+    def _get(self, text, font, style, count):
+        """get(); count=False for the internal plain-mask lookup behind a
+        derived style, so one caller lookup counts once in stats()"""
+        key = (text, _font_key(font), font.size, style)
+        with self._lock:
+            text_mask = self._entries.get(key)
+            if text_mask is not None:
+                self._entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return text_mask
+            if count:
+                self.misses += 1
+
+        if style == 'plain':
+            text_mask = render_text_mask(text, font)
+        else:
+            method, *args = style
+            text_mask = getattr(self._get(text, font, 'plain', False), method)(*args)
+        text_mask.mask.flags.writeable = False
+
+        with self._lock:
+            if self.maxsize > 0:
+                self._entries[key] = text_mask
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return text_mask
+
+    def stats(self):
+        """Counters for tuning maxsize"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+def _font_key(font):
+    """Font file path, or the font object itself for in-memory fonts"""
+    path = getattr(font, 'path', None)
+    return path if isinstance(path, str) else id(font)
+
+
+def _glyph_columns(text, font, left):
+    """Start column of every character within the mask
+
+    Advances come from one getlength() per distinct character, scaled so
+    they add up to the laid-out string width (which includes kerning).
+    """
+    if not text:
+        return np.zeros(0, dtype=np.intp)
+    advances = {ch: font.getlength(ch) for ch in set(text)}
+    steps = np.array([advances[ch] for ch in text], dtype=np.float64)
+    total = steps.sum()
+    if total > 0:
+        steps *= font.getlength(text) / total
+    starts = np.concatenate(([0.0], np.cumsum(steps)[:-1]))
+    return np.round(starts - left).astype(np.intp)
+
+
+def stripe_colors(text_mask, colors):
+    """Color per mask column, cycling colors per character
+
+    A (w, 3) column stripe for one line; for several lines an (h, w, 3)
+    layer, one stripe per line band, with the color cycle continuing
+    from line to line.
+    """
+    width, height = text_mask.size
+    palette = np.asarray(colors, dtype=np.uint8)
+
+    stripes = []
+    first_char = 0
+    for _, columns in text_mask.lines:
+        # Index of the character owning each column
+        starts = np.clip(columns, 0, width)
+        owner = np.searchsorted(starts, np.arange(width), side='right') - 1
+        owner = np.clip(owner, 0, None) + first_char
+        stripes.append(palette[owner % len(palette)])
+        first_char += len(columns)
+
+    if len(stripes) == 1:
+        return stripes[0]
+    rows = [min(row, height) for row, _ in text_mask.lines] + [height]
+    layer = np.empty((height, width, 3), dtype=np.uint8)
+    for stripe, top, bottom in zip(stripes, rows, rows[1:]):
+        layer[top:bottom] = stripe
+    return layer
+
+
+def vertical_gradient(height, top, bottom):
+    """(h, 1, 3) column fading from the top color to the bottom color"""
+    t = np.linspace(0.0, 1.0, max(1, height), endpoint=False, dtype=np.float32)[:, None]
+    column = np.asarray(top, dtype=np.float32) * (1 - t) + np.asarray(bottom, dtype=np.float32) * t
+    return np.clip(column, 0, 255).astype(np.uint8)[:, None, :]
+
+
+def paint(img, text_mask, origin, color):
+    """Alpha-composite a color through the mask onto img in place
+
+    color is an RGB tuple, a (w, 3) column stripe, an (h, 1, 3) row
+    gradient or an (h, w, 3) layer.
+    """
+    width, height = text_mask.size
+    if isinstance(color, tuple):
+        layer = Image.new('RGB', (width, height), color)
+    else:
+        color = np.broadcast_to(np.asarray(color, dtype=np.uint8), (height, width, 3))
+        layer = Image.fromarray(np.ascontiguousarray(color))
+    img.paste(layer, origin, Image.fromarray(text_mask.mask))
+    return img
@@ -2,164 +2,242 @@
 CRT Buddy - Y2K Style Effects
 Y2K style image filters and effects
 """
-from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
+from functools import lru_cache
+from PIL import Image
 import numpy as np
-import random
+from effects.effect_graph import (
+    EffectPipeline, Kernel, PointOp, blur3, gaussian_blur, gaussian_halo, edge3x3,
+    FIND_EDGES, EDGE_ENHANCE_MORE,
+)
+
+
+# Rows of VHS grain drawn from one seed; tiles gather whole blocks
+NOISE_BLOCK = 64
+
+
+@lru_cache(maxsize=32)
+def _scanline_mask(height, spacing=3, intensity=50 / 255):
+    """Cached (H, 1, 1) brightness mask darkening every `spacing`-th row"""
+    mask = np.ones((height, 1, 1), dtype=np.float32)
+    mask[::spacing] = 1.0 - intensity
+    mask.setflags(write=False)
+    return mask
+
+
+@lru_cache(maxsize=16)
+def _rainbow_lut(height):
+    """Cached holographic rainbow, one RGB color per row, shape (H, 1, 3)"""
+    hue = np.arange(height, dtype=np.float64) / height * 255
+    phase = hue[:, None] * 0.02 + np.array([0.0, 2.0, 4.0])
+    lut = (128 + 127 * np.sin(phase)).astype(np.int32).astype(np.float32)
+    lut = lut[:, None, :]
+    lut.setflags(write=False)
+    return lut
+
+
+@lru_cache(maxsize=16)
+def _holographic_overlay(height, alpha, gain):
+    """Rainbow column pre-scaled by blend alpha and brightness gain"""
+    overlay = _rainbow_lut(height) * np.float32(alpha * gain)
+    overlay.setflags(write=False)
+    return overlay
 
 
 class Y2KStyles:
     """Y2K style image effects"""
     
-    def apply_effect(self, img, effect_name):
+    EFFECTS = ('crt', 'vhs', 'holographic', 'chrome', 'neon', 'pixelate')
+    
+    def __init__(self, seed=None):
+        # Accepts an int seed or an existing numpy Generator to share
+        self.rng = np.random.default_rng(seed)
+    
+    def apply_effect(self, img, effect_name, rng=None):
         """Apply specified effect to image"""
-        effects = {
-            'crt': self.crt_effect,
-            'vhs': self.vhs_effect,
-            'holographic': self.holographic_effect,
-            'chrome': self.chrome_effect,
-            'neon': self.neon_effect,
-            'pixelate': self.pixelate_effect
-        }
-        
-        effect_func = effects.get(effect_name, self.crt_effect)
-        return effect_func(img)
+        if effect_name not in self.EFFECTS:
+            effect_name = 'crt'
+        return self.pipeline([effect_name], rng).run(img)
+    
+    def pipeline(self, effect_names, rng=None):
+        """Build one single-buffer pipeline from a list of effect names
+        
+        e.g. Y2KStyles().pipeline(['crt', 'neon', 'pixelate'])(img)
+        Random stages draw from `rng`, defaulting to this instance's generator.
+        """
+        rng = self.rng if rng is None else rng
+        stages = []
+        for name in effect_names:
+            if name not in self.EFFECTS:
+                raise ValueError(f"Unknown effect: {name}")
+            if name == 'vhs':
+                stages.extend(self._vhs_stages(rng))
+            else:
+                stages.extend(getattr(self, f"_{name}_stages")())
+        return EffectPipeline(stages)
     
     def crt_effect(self, img):
         """CRT monitor effect with scanlines and RGB shift"""
-        img = img.copy()
-        width, height = img.size
-        
-        # RGB shift
-        img_array = np.array(img)
-        shifted = img_array.copy()
-        shifted[:, 2:, 0] = img_array[:, :-2, 0]  # Red shift
-        shifted[:, :-2, 2] = img_array[:, 2:, 2]  # Blue shift
-        img = Image.fromarray(shifted)
-        
-        # Add scanlines
-        draw = ImageDraw.Draw(img)
-        for y in range(0, height, 3):
-            draw.line([(0, y), (width, y)], fill=(0, 0, 0, 50), width=1)
-        
-        # Slight blur
-        img = img.filter(ImageFilter.GaussianBlur(0.5))
-        
-        return img
+        return self.pipeline(['crt']).run(img)
     
-    def vhs_effect(self, img):
+    def vhs_effect(self, img, rng=None):
         """VHS tape glitch effect"""
-        img = img.copy()
-        width, height = img.size
-        img_array = np.array(img)
-        
-        # Horizontal displacement
-        for _ in range(random.randint(3, 8)):
-            y = random.randint(0, height - 50)
-            h = random.randint(5, 30)
-            shift = random.randint(-20, 20)
-            
-            if shift > 0:
-                img_array[y:y+h, shift:] = img_array[y:y+h, :-shift]
-            else:
-                img_array[y:y+h, :shift] = img_array[y:y+h, -shift:]
-        
-        img = Image.fromarray(img_array)
-        
-        # Color distortion
-        enhancer = ImageEnhance.Color(img)
-        img = enhancer.enhance(1.3)
-        
-        # Add noise
-        img_array = np.array(img)
-        noise = np.random.randint(-20, 20, img_array.shape, dtype=np.int16)
-        noisy = np.clip(img_array.astype(np.int16) + noise, 0, 255).astype(np.uint8)
-        img = Image.fromarray(noisy)
-        
-        return img
+        return self.pipeline(['vhs'], rng).run(img)
     
     def holographic_effect(self, img):
         """Holographic rainbow gradient effect"""
-        img = img.copy()
-        width, height = img.size
-        
-        # Create rainbow overlay
-        overlay = Image.new('RGB', (width, height))
-        draw = ImageDraw.Draw(overlay)
-        
-        for y in range(height):
-            hue = (y / height) * 255
-            r = int(128 + 127 * np.sin(hue * 0.02))
-            g = int(128 + 127 * np.sin(hue * 0.02 + 2))
-            b = int(128 + 127 * np.sin(hue * 0.02 + 4))
-            draw.line([(0, y), (width, y)], fill=(r, g, b))
-        
-        # Blend
-        img = Image.blend(img, overlay, 0.3)
-        
-        # Enhance
-        enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(1.2)
-        
-        return img
+        return self.pipeline(['holographic']).run(img)
     
     def chrome_effect(self, img):
         """Metallic chrome effect"""
-        # Convert to grayscale
-        img = img.convert('L')
-        
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(2.0)
-        
-        # Apply edge enhancement
-        img = img.filter(ImageFilter.EDGE_ENHANCE_MORE)
-        
-        # Convert back to RGB with silver tint
-        img = img.convert('RGB')
-        img_array = np.array(img)
-        img_array[:, :, 0] = np.clip(img_array[:, :, 0] * 1.1, 0, 255)  # More red
-        img_array[:, :, 2] = np.clip(img_array[:, :, 2] * 1.1, 0, 255)  # More blue
-        img = Image.fromarray(img_array.astype(np.uint8))
-        
-        return img
+        return self.pipeline(['chrome']).run(img)
     
     def neon_effect(self, img):
         """Neon glow effect"""
-        img = img.copy()
-        
-        # Enhance colors
-        enhancer = ImageEnhance.Color(img)
-        img = enhancer.enhance(2.0)
-        
-        # Edge detection
-        edges = img.filter(ImageFilter.FIND_EDGES)
-        
-        # Blur edges for glow
-        glow = edges.filter(ImageFilter.GaussianBlur(5))
-        
-        # Composite
-        img = Image.blend(img, glow, 0.5)
-        
-        # Brighten
-        enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(1.3)
-        
-        return img
+        return self.pipeline(['neon']).run(img)
     
     def pixelate_effect(self, img):
         """Retro pixelation effect"""
-        width, height = img.size
-        
-        # Shrink
-        pixel_size = 8
-        small_size = (width // pixel_size, height // pixel_size)
-        img_small = img.resize(small_size, Image.Resampling.NEAREST)
-        
-        # Enlarge back
-        img = img_small.resize((width, height), Image.Resampling.NEAREST)
+        return self.pipeline(['pixelate']).run(img)
+    
+    # ------------------------------------------------------------------
+    # Stage definitions
+    # ------------------------------------------------------------------
+    
+    def _crt_stages(self, spacing=3, intensity=50 / 255):
+        def crt(buf, ctx):
+            # RGB shift
+            buf[:, 2:, 0] = buf[:, :-2, 0].copy()  # Red shift
+            buf[:, :-2, 2] = buf[:, 2:, 2].copy()  # Blue shift
+            
+            # Darken scanlines
+            buf *= _scanline_mask(ctx.height, spacing, intensity)[ctx.rows(buf)]
+            
+            # Slight blur
+            return blur3(buf)
         
-        # Reduce colors
-        img = img.convert('P', palette=Image.Palette.ADAPTIVE, colors=32)
-        img = img.convert('RGB')
+        return [Kernel('crt', crt, halo=1)]
+    
+    def _vhs_stages(self, rng, noise_level=20):
+        def glitch_bands(height, width):
+            # Horizontal displacement bands
+            count = rng.integers(3, 9)
+            tops = rng.integers(0, max(0, height - 50) + 1, count)
+            heights = rng.integers(5, 31, count)
+            shifts = rng.integers(-20, 21, count)
+            
+            # Compose every band into one column remap per affected row
+            rows = np.unique(np.concatenate([
+                np.arange(top, min(top + h, height)) for top, h in zip(tops, heights)
+            ]))
+            cols = np.arange(width)
+            remap = np.broadcast_to(cols, (len(rows), width)).copy()
+            for top, h, shift in zip(tops, heights, shifts):
+                if shift == 0:
+                    continue
+                src = cols - shift
+                src = np.where((src >= 0) & (src < width), src, cols)
+                band = (rows >= top) & (rows < top + h)
+                remap[band] = remap[band][:, src]
+            return rows, remap
+        
+        def displace(buf, ctx):
+            # Bands are drawn once per frame and shared by all its tiles
+            key = ('vhs_bands', id(displace))
+            if key not in ctx.state:
+                ctx.state[key] = glitch_bands(ctx.height, buf.shape[1])
+            rows, remap = ctx.state[key]
+            
+            # Gather the displaced rows that fall inside this buffer
+            local = rows - ctx.y0
+            keep = (local >= 0) & (local < buf.shape[0])
+            local = local[keep]
+            buf[local] = np.take_along_axis(buf[local], remap[keep][:, :, None], axis=1)
+            return buf
+        
+        def noise(buf, ctx):
+            # Grain is drawn per block of frame rows from a per-frame seed,
+            # so tiles (and their halo rows) get the same grain as a whole-frame run
+            key = ('vhs_noise', id(noise))
+            if key not in ctx.state:
+                ctx.state[key] = int(rng.integers(0, 2 ** 63))
+            seed = ctx.state[key]
+            rows = ctx.rows(buf)
+            width = buf.shape[1]
+            for block in range(rows.start // NOISE_BLOCK, (rows.stop - 1) // NOISE_BLOCK + 1):
+                start = block * NOISE_BLOCK
+                grain = np.random.default_rng((seed, block)).integers(
+                    -noise_level, noise_level, (NOISE_BLOCK, width, 3), dtype=np.int8)
+                lo, hi = max(rows.start, start), min(rows.stop, start + NOISE_BLOCK)
+                buf[lo - ctx.y0:hi - ctx.y0] += grain[lo - start:hi - start]
+            np.clip(buf, 0, 255, out=buf)
+            return buf
+        
+        return [
+            Kernel('vhs_displace', displace),
+            PointOp.color(1.3),  # Color distortion
+            Kernel('vhs_noise', noise),
+        ]
+    
+    def _holographic_stages(self, alpha=0.3, gain=1.2):
+        def holographic(buf, ctx):
+            # Blend with the rainbow and brighten in one pass:
+            # (img * (1 - a) + rainbow * a) * gain
+            buf *= np.float32((1.0 - alpha) * gain)
+            buf += _holographic_overlay(ctx.height, alpha, gain)[ctx.rows(buf)]
+            return buf
+        
+        return [Kernel('holographic', holographic)]
+    
+    def _chrome_stages(self):
+        def edge_enhance(buf, ctx):
+            # Channels are identical after grayscale, filter just one
+            edges = edge3x3(buf[:, :, :1], EDGE_ENHANCE_MORE)
+            return np.repeat(edges, 3, axis=2)
+        
+        return [
+            PointOp.grayscale(),
+            PointOp.contrast(2.0),
+            Kernel('edge_enhance_more', edge_enhance, halo=1),
+            PointOp.tint(r=1.1, b=1.1),  # Silver tint
+        ]
+    
+    def _neon_stages(self, glow_radius=5):
+        def glow(buf, ctx):
+            # Blur edges for glow
+            edges = gaussian_blur(edge3x3(buf, FIND_EDGES), glow_radius)
+            
+            # Composite
+            buf *= 0.5
+            edges *= 0.5
+            buf += edges
+            return buf
+        
+        return [
+            PointOp.color(2.0),
+            Kernel('neon_glow', glow, halo=1 + gaussian_halo(glow_radius)),
+            PointOp.brightness(1.3),
+        ]
+    
+    def _pixelate_stages(self, pixel_size=8, colors=32):
+        def pixelate(buf, ctx):
+            height, width = buf.shape[:2]
+            small_h = max(1, height // pixel_size)
+            small_w = max(1, width // pixel_size)
+            
+            # Shrink (nearest sampling at pixel centers)
+            rows = ((np.arange(small_h) + 0.5) * height / small_h).astype(np.intp)
+            cols = ((np.arange(small_w) + 0.5) * width / small_w).astype(np.intp)
+            small = np.clip(buf[rows[:, None], cols], 0, 255).astype(np.uint8)
+            
+            # Reduce colors on the small image, the enlarged one has the same colors
+            small = Image.fromarray(small)
+            small = small.convert('P', palette=Image.Palette.ADAPTIVE, colors=colors)
+            small = np.asarray(small.convert('RGB'))
+            
+            # Enlarge back
+            rows = np.arange(height) * small_h // height
+            cols = np.arange(width) * small_w // width
+            return small[rows[:, None], cols].astype(np.float32)
         
-        return img
+        # Block grid and palette are global to the frame
+        return [Kernel('pixelate', pixelate, tileable=False)]
@@ -0,0 +1,178 @@
+"""
+CRT Buddy - Batch Meme Generator
+Headless meme rendering across a process pool
+
+Usage (from the CRT_Buddy directory):
+    python -m generators.batch photos/ --effect crt
+    python -m generators.batch "scans/*.jpg" --effect random --text "Y2K"
+    python -m generators.batch --text-file captions.txt --style neon
+"""
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from effects.text_effects import TextEffects
+from effects.y2k_styles import Y2KStyles
+from generators.meme_engine import MemeEngine
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.tif', '.tiff')
+
+# One engine per worker process, created by _init_worker
+_engine = None
+
+
+def _init_worker(output_dir):
+    global _engine
+    _engine = MemeEngine(output_dir=output_dir)
+
+
+def _render_job(job):
+    """Render and save one meme inside a worker, returning the output path"""
+    kind, source, options = job
+    seed = options['seed']
+    if kind == 'image':
+        img = _engine.generate_image_meme(
+            source,
+            text=options['text'],
+            effect=options['effect'],
+            seed=seed,
+            full_resolution=options['full_resolution'],
+        )
+        prefix = options['prefix'] or 'y2k_image'
+    else:
+        img = _engine.generate_text_meme(source, style=options['style'],
+                                         size=options['size'], seed=seed)
+        prefix = options['prefix'] or 'y2k_text'
+    return _engine.save_meme(img, prefix)
+
+
+def available_cores():
+    """CPUs this process may run on (respects affinity / cgroup pinning)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def collect_images(patterns):
+    """Expand directories and glob patterns into a sorted list of image files"""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern)
+        found.extend(
+            path for path in candidates
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)
+        )
+    return sorted(set(found))
+
+
+def read_text_lines(path):
+    """Non-empty lines of a caption file"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def parse_size(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    return width, height
+
+
+def build_jobs(args):
+    """(kind, source, options) tuples; job i gets seed + i when seeded"""
+    sources = [('image', path) for path in collect_images(args.inputs)]
+    if args.text_file:
+        sources += [('text', line) for line in read_text_lines(args.text_file)]
+
+    jobs = []
+    for index, (kind, source) in enumerate(sources):
+        options = {
+            'effect': args.effect,
+            'style': args.style,
+            'text': args.text,
+            'size': args.size,
+            'prefix': args.prefix,
+            'full_resolution': args.full_resolution,
+            'seed': None if args.seed is None else args.seed + index,
+        }
+        jobs.append((kind, source, options))
+    return jobs
+
+
+def run_batch(jobs, output_dir, workers=None):
+    """Render jobs in a process pool; returns (saved paths, [(source, error)])"""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or available_cores()
+    saved, failed = [], []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(output_dir,)) as pool:
+        futures = {pool.submit(_render_job, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            source = futures[future][1]
+            try:
+                saved.append(future.result())
+            except Exception as e:
+                failed.append((source, e))
+                print(f"[{done}/{len(jobs)}] FAILED {source}: {e}", file=sys.stderr)
+            else:
+                print(f"[{done}/{len(jobs)}] {source}")
+
+    return saved, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m generators.batch',
+        description='Batch-generate Y2K memes from images and/or caption lines.',
+    )
+    parser.add_argument('inputs', nargs='*',
+                        help='image files, directories or glob patterns')
+    parser.add_argument('--text-file',
+                        help='file with one caption per line to render as text memes')
+    parser.add_argument('--effect', default='random',
+                        choices=('random',) + Y2KStyles.EFFECTS,
+                        help='image effect (default: random)')
+    parser.add_argument('--style', default='random',
+                        choices=('random',) + TextEffects.STYLES,
+                        help='text meme style (default: random)')
+    parser.add_argument('--text', default='',
+                        help='caption overlaid on image memes')
+    parser.add_argument('--size', type=parse_size, default=(800, 600),
+                        help='text meme size, e.g. 1024x768 (default: 800x600)')
+    parser.add_argument('--output', '-o', default='output',
+                        help='output directory (default: output)')
+    parser.add_argument('--prefix', help='output filename prefix')
+    parser.add_argument('--workers', '-j', type=int,
+                        help='worker processes (default: available cores)')
+    parser.add_argument('--seed', type=int,
+                        help='base seed; job i uses seed + i for reproducible output')
+    parser.add_argument('--full-resolution', action='store_true',
+                        help='do not downsize large images (tiled processing)')
+    args = parser.parse_args(argv)
+
+    if not args.inputs and not args.text_file:
+        parser.error('give image inputs and/or --text-file')
+
+    jobs = build_jobs(args)
+    if not jobs:
+        print('Nothing to do: no images or captions found.')
+        return 1
+
+    workers = args.workers or available_cores()
+    print(f"Rendering {len(jobs)} memes with {workers} workers -> {args.output}")
+    saved, failed = run_batch(jobs, args.output, workers)
+    print(f"Done: {len(saved)} saved, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,25 +2,182 @@
 CRT Buddy - Meme Generator Engine
 Y2K style Meme generation engine
 """
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
-import random
+from PIL import Image, ImageDraw
+import numpy as np
 import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
+from functools import lru_cache, wraps
 from effects.y2k_styles import Y2KStyles
 from effects.text_effects import TextEffects
+from effects.fonts import get_font
+from effects.sprites import scatter_sprites
+from effects.animation import CRTAnimator, quantize_frames
+from generators.profiling import RenderProfiler
+
+
+# Stage context used when profiling is off (reusable, does nothing)
+_NOT_PROFILING = nullcontext()
+
+
+def _profiled(name):
+    """Record each call of a MemeEngine method as one render when profiling"""
+    def decorate(method):
+        @wraps(method)
+        def profiled(self, *args, **kwargs):
+            if self.profiler is None:
+                return method(self, *args, **kwargs)
+            with self.profiler.render(name):
+                return method(self, *args, **kwargs)
+        return profiled
+    return decorate
+
+
+@lru_cache(maxsize=8)
+def _background_plate(width, height, grid=50, grid_color=(255, 0, 255), grid_alpha=30 / 255):
+    """Cached (H, W, 3) uint8 Y2K backdrop: vertical gradient plus grid
+    
+    The grid is blended at its real alpha once per pixel (the old RGB
+    line drawing ignored the alpha and drew it opaque). Read-only, since
+    every meme of this size shares it.
+    """
+    # Gradient background: purple at the top to orange at the bottom
+    t = np.arange(height, dtype=np.float64) / height
+    column = np.stack([128 + 127 * t, 128 * t, 128 - 128 * t], axis=1).astype(np.uint8)
+    plate = np.repeat(column[:, None, :], width, axis=1)
+    
+    # Add grid (rows first, then columns on the rows not already blended)
+    color = np.asarray(grid_color, dtype=np.float32) * np.float32(grid_alpha)
+    keep = np.float32(1 - grid_alpha)
+    
+    def blend(pixels):
+        return np.rint(pixels * keep + color).astype(np.uint8)
+    
+    plate[::grid] = blend(plate[::grid])
+    off_grid = np.arange(height) % grid != 0
+    plate[off_grid, ::grid] = blend(plate[off_grid, ::grid])
+    
+    plate.setflags(write=False)
+    return plate
+
+
+class OutputNameAllocator:
+    """Collision-free prefix_N.ext filenames in one output directory
+    
+    The directory is scanned once for the highest N per prefix; after that
+    names come from an in-memory counter. Each name is claimed by creating
+    the file with O_CREAT | O_EXCL, so threads and processes sharing the
+    directory can never be handed the same file.
+    """
+    
+    _NAME = re.compile(r'^(?P<prefix>.+)_(?P<counter>\d+)\.[^.]+$')
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self._next = None
+        self._lock = threading.Lock()
+    
+    def _scan(self):
+        """Next free counter per prefix, from a single directory listing"""
+        highest = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                match = self._NAME.match(entry.name)
+                if match:
+                    prefix = match.group('prefix')
+                    counter = int(match.group('counter'))
+                    highest[prefix] = max(highest.get(prefix, 0), counter)
+        return {prefix: counter + 1 for prefix, counter in highest.items()}
+    
+    def claim(self, prefix, ext='png'):
+        """Atomically create an empty prefix_N.ext and return its path"""
+        with self._lock:
+            if self._next is None:
+                self._next = self._scan()
+            counter = self._next.get(prefix, 1)
+            while True:
+                path = os.path.join(self.directory, f"{prefix}_{counter}.{ext}")
+                try:
+                    fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                except FileExistsError:
+                    # Taken by another writer since the scan
+                    counter += 1
+                    continue
+                os.close(fd)
+                self._next[prefix] = counter + 1
+                return path
+
+
+class BackgroundSaver:
+    """Writer thread(s) for image encoding with a bounded backlog
+    
+    At most max_pending saves may be queued or running; submit() blocks
+    (or raises queue.Full when block=False / on timeout) until a slot
+    frees up, so a fast producer cannot pile up unbounded images in memory.
+    """
+    
+    def __init__(self, max_pending=8, workers=1):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="meme-saver")
+        self._slots = threading.BoundedSemaphore(max_pending)
+    
+    def submit(self, fn, *args, block=True, timeout=None, **kwargs):
+        """Schedule fn(*args, **kwargs) and return its Future"""
+        acquired = self._slots.acquire(timeout=timeout) if block else self._slots.acquire(False)
+        if not acquired:
+            raise queue.Full("save queue is full")
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def shutdown(self, wait=True):
+        """Stop accepting saves; with wait=True, finish the pending ones"""
+        self._pool.shutdown(wait=wait)
 
 
 class MemeEngine:
     """Y2K style Meme generation engine"""
     
-    def __init__(self, output_dir="output"):
+    # Output format name -> (PIL format, file extension)
+    SAVE_FORMATS = {
+        'png': ('PNG', 'png'),
+        'webp': ('WEBP', 'webp'),
+        'jpeg': ('JPEG', 'jpg'),
+        'jpg': ('JPEG', 'jpg'),
+        'gif': ('GIF', 'gif'),
+    }
+    
+    # Animated output format name -> (PIL format, file extension)
+    ANIMATION_FORMATS = {
+        'gif': ('GIF', 'gif'),
+        'apng': ('PNG', 'png'),
+        'webp': ('WEBP', 'webp'),
+    }
+    
+    def __init__(self, output_dir="output", seed=None, max_pending_saves=8,
+                 decoration_count=20, profile=False):
         self.output_dir = output_dir
-        self.y2k_styles = Y2KStyles()
+        # Per-stage timings of every render when enabled (see enable_profiling)
+        self.profiler = RenderProfiler() if profile else None
+        # Sprites stamped on each text meme; hundreds cost about the same as 20
+        self.decoration_count = decoration_count
+        self.max_pending_saves = max_pending_saves
+        self._saver = None
+        self._saver_lock = threading.Lock()
+        self.rng = np.random.default_rng(seed)
+        self.y2k_styles = Y2KStyles(self.rng)
         self.text_effects = TextEffects()
         
         # Create output directory
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        self.names = OutputNameAllocator(output_dir)
         
         # Y2K phrases
         self.y2k_phrases = [
@@ -46,96 +203,230 @@ class MemeEngine:
             "MILLENNIUM BUG FREE"
         ]
     
-    def generate_text_meme(self, text, style='random', size=(800, 600)):
-        """Generate text-based meme"""
+    @_profiled('text_meme')
+    def generate_text_meme(self, text, style='random', size=(800, 600), seed=None):
+        """Generate text-based meme
+        
+        Passing a seed makes the render reproducible regardless of what
+        the engine rendered before.
+        """
+        rng = self._rng(seed)
+        
         # Create base image
         img = Image.new('RGB', size, color=(0, 0, 0))
         
         # Apply Y2K background
-        img = self._apply_y2k_background(img)
+        with self._stage('background'):
+            img = self._apply_y2k_background(img)
         
         # Add text with effect
         if style == 'random':
-            style = random.choice(['gradient', 'glitch', 'neon', 'chrome', 'retro'])
+            style = self._choice(rng, list(TextEffects.STYLES))
         
-        img = self.text_effects.apply_effect(img, text, style)
+        with self._stage('text'):
+            img = self.text_effects.apply_effect(img, text, style)
         
         # Add decorations
-        img = self._add_decorations(img)
+        with self._stage('decorations'):
+            img = self._add_decorations(img, rng)
         
         return img
     
-    def generate_image_meme(self, image_path, text="", effect='random'):
-        """Generate image-based meme with Y2K effects"""
-        # Load image
-        img = Image.open(image_path)
-        img = img.convert('RGB')
+    @_profiled('image_meme')
+    def generate_image_meme(self, image_path, text="", effect='random', seed=None,
+                            full_resolution=False, tile_height=512):
+        """Generate image-based meme with Y2K effects
         
-        # Resize if too large
-        max_size = 1200
-        if max(img.size) > max_size:
-            ratio = max_size / max(img.size)
-            new_size = tuple(int(dim * ratio) for dim in img.size)
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
+        With full_resolution=True the image is not downsized; the effect
+        runs in horizontal tiles so working memory stays bounded for very
+        large scans (effects that need the whole frame run in one piece).
+        """
+        rng = self._rng(seed)
+        
+        # Load image, downsized to 1200px unless full resolution was asked for
+        img = self._load_image(image_path, None if full_resolution else 1200)
         
         # Apply Y2K effect
         if effect == 'random':
-            effect = random.choice(['crt', 'vhs', 'holographic', 'chrome', 'neon', 'pixelate'])
+            effect = self._choice(rng, list(Y2KStyles.EFFECTS))
         
-        img = self.y2k_styles.apply_effect(img, effect)
+        with self._stage('effect'):
+            if full_resolution:
+                pipeline = self.y2k_styles.pipeline([effect], rng)
+                if pipeline.tileable:
+                    img = pipeline.run_tiled(img, tile_height)
+                else:
+                    img = pipeline.run(img)
+            else:
+                img = self.y2k_styles.apply_effect(img, effect, rng)
         
         # Add text if provided
         if text:
-            img = self._add_text_overlay(img, text)
+            with self._stage('text'):
+                img = self._add_text_overlay(img, text)
         
         return img
     
-    def generate_random_meme(self):
+    @_profiled('random_meme')
+    def generate_random_meme(self, seed=None):
         """Generate completely random meme"""
+        rng = self._rng(seed)
+        
         # Random phrase
-        phrase = random.choice(self.y2k_phrases)
+        phrase = self._choice(rng, self.y2k_phrases)
         
         # Random size
         sizes = [(800, 600), (640, 480), (1024, 768)]
-        size = random.choice(sizes)
+        size = self._choice(rng, sizes)
         
         # Generate
-        return self.generate_text_meme(phrase, 'random', size)
-    
-    def save_meme(self, img, prefix="meme"):
-        """Save meme to output directory"""
-        # Generate filename
-        counter = 1
-        while True:
-            filename = f"{prefix}_{counter}.png"
-            filepath = os.path.join(self.output_dir, filename)
-            if not os.path.exists(filepath):
-                break
-            counter += 1
+        return self.generate_text_meme(phrase, 'random', size, seed=rng)
+    
+    @_profiled('animated_meme')
+    def generate_animated_meme(self, text="", image_path=None, style='random', frames=12,
+                               size=(480, 360), seed=None):
+        """Generate a looping CRT animation, returned as a list of frames
+        
+        The still (a text meme, or image_path with an optional caption) is
+        rendered once; the frames add a scrolling scanline, VHS jitter and
+        a pulsing neon glow on top of it. Save with save_animation().
+        """
+        rng = self._rng(seed)
+        
+        if image_path:
+            img = self._load_image(image_path, max(size))
+            if text:
+                with self._stage('text'):
+                    img = self._add_text_overlay(img, text)
+        else:
+            img = self.generate_text_meme(text or self._choice(rng, self.y2k_phrases),
+                                          style, size, seed=rng)
+        
+        with self._stage('effect'):
+            animator = CRTAnimator(img, rng, frames)
+        with self._stage('frames'):
+            return list(animator)
+    
+    @_profiled('save_animation')
+    def save_animation(self, frames, prefix="y2k_anim", fmt="gif", duration=80, loop=0,
+                       **save_options):
+        """Save frames as an animated GIF, APNG or WebP
+        
+        GIF and APNG frames are quantized to one shared palette first.
+        duration is milliseconds per frame and loop=0 repeats forever.
+        The encoders store only the region that changed between frames.
+        """
+        try:
+            pil_format, ext = self.ANIMATION_FORMATS[fmt.lower()]
+        except KeyError:
+            raise ValueError(f"Unsupported animation format: {fmt}")
+        if not frames:
+            raise ValueError("No frames to save")
+        if pil_format != 'WEBP':
+            with self._stage('quantize'):
+                frames = quantize_frames(frames)
+        
+        options = {'duration': duration, 'loop': loop}
+        options.update(save_options)
+        
+        # Claim a unique filename
+        filepath = self.names.claim(prefix, ext)
         
         # Save
-        img.save(filepath, 'PNG')
+        try:
+            with self._stage('encode'):
+                frames[0].save(filepath, pil_format, save_all=True,
+                               append_images=frames[1:], **options)
+        except Exception:
+            os.remove(filepath)
+            raise
         print(f"Saved: {filepath}")
         return filepath
     
-    def _apply_y2k_background(self, img):
-        """Apply Y2K style background"""
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
+    @_profiled('save')
+    def save_meme(self, img, prefix="meme", fmt="png", **save_options):
+        """Save meme to output directory
         
-        # Gradient background
-        for y in range(height):
-            r = int(128 + 127 * (y / height))
-            g = int(0 + 128 * (y / height))
-            b = int(128 - 128 * (y / height))
-            draw.line([(0, y), (width, y)], fill=(r, g, b))
+        fmt is 'png', 'webp' or 'jpeg'; save_options go to PIL's save, e.g.
+        compress_level=1 or optimize=True for PNG, quality=90 for WebP/JPEG.
+        """
+        try:
+            pil_format, ext = self.SAVE_FORMATS[fmt.lower()]
+        except KeyError:
+            raise ValueError(f"Unsupported format: {fmt}")
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
         
-        # Add grid
-        for x in range(0, width, 50):
-            draw.line([(x, 0), (x, height)], fill=(255, 0, 255, 30), width=1)
-        for y in range(0, height, 50):
-            draw.line([(0, y), (width, y)], fill=(255, 0, 255, 30), width=1)
+        # Claim a unique filename
+        filepath = self.names.claim(prefix, ext)
         
+        # Save
+        try:
+            with self._stage('encode'):
+                img.save(filepath, pil_format, **save_options)
+        except Exception:
+            os.remove(filepath)
+            raise
+        print(f"Saved: {filepath}")
+        return filepath
+    
+    def save_meme_async(self, img, prefix="meme", fmt="png", block=True, timeout=None,
+                        **save_options):
+        """Queue a save on the writer thread and return a Future of the path
+        
+        The caller must not modify img afterwards. When max_pending_saves
+        saves are already in flight this blocks, or raises queue.Full if
+        block=False or the timeout expires.
+        """
+        with self._saver_lock:
+            if self._saver is None:
+                self._saver = BackgroundSaver(self.max_pending_saves)
+        return self._saver.submit(self.save_meme, img, prefix, fmt,
+                                  block=block, timeout=timeout, **save_options)
+    
+    def close(self, wait=True):
+        """Flush queued saves and stop the writer thread"""
+        with self._saver_lock:
+            saver, self._saver = self._saver, None
+        if saver is not None:
+            saver.shutdown(wait=wait)
+    
+    def _load_image(self, image_path, max_size=None):
+        """Open an image as RGB, scaled so its longest side is at most max_size
+        
+        Large inputs are shrunk while decoding: JPEGs decode straight at
+        1/2, 1/4 or 1/8 scale (draft mode) and anything still more than
+        twice the target gets an integer box reduce() before the final
+        LANCZOS pass, so a 6000x4000 photo is never fully decoded.
+        """
+        with self._stage('decode'):
+            img = Image.open(image_path)
+            if not max_size or max(img.size) <= max_size:
+                return img.convert('RGB')
+            
+            ratio = max_size / max(img.size)
+            # Very thin inputs would otherwise scale their short side to 0
+            new_size = tuple(max(1, int(dim * ratio)) for dim in img.size)
+            
+            # Keep at least 2x the target so LANCZOS still has detail to work with
+            img.draft('RGB', (new_size[0] * 2, new_size[1] * 2))
+            img = img.convert('RGB')
+        
+        with self._stage('resize'):
+            factor = min(img.width // new_size[0], img.height // new_size[1]) // 2
+            if factor >= 2:
+                img = img.reduce(factor)
+            
+            return img.resize(new_size, Image.Resampling.LANCZOS)
+    
+    def _apply_y2k_background(self, img):
+        """Apply Y2K style background
+        
+        The gradient-and-grid plate is rendered once per size and copied
+        onto each meme.
+        """
+        width, height = img.size
+        img.paste(Image.fromarray(_background_plate(width, height)))
         return img
     
     def _add_text_overlay(self, img, text):
@@ -144,11 +435,7 @@ class MemeEngine:
         width, height = img.size
         
         # Try to use a nice font
-        try:
-            font_size = int(height * 0.1)
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
+        font = get_font(int(height * 0.1), self.text_effects.font_name)
         
         # Get text size
         bbox = draw.textbbox((0, 0), text, font=font)
@@ -168,17 +455,48 @@ class MemeEngine:
         
         return img
     
-    def _add_decorations(self, img):
-        """Add Y2K style decorations"""
-        draw = ImageDraw.Draw(img)
-        width, height = img.size
+    def _add_decorations(self, img, rng=None, count=None):
+        """Add Y2K style decorations
+        
+        Stars, sparkles and glitter are pre-rendered sprites stamped in one
+        batched composite, so count can go into the hundreds.
+        """
+        rng = self.rng if rng is None else rng
+        count = self.decoration_count if count is None else count
         
         # Random stars
-        for _ in range(20):
-            x = random.randint(0, width)
-            y = random.randint(0, height)
-            size = random.randint(2, 5)
-            color = random.choice([(255, 0, 255), (0, 255, 255), (255, 255, 0)])
-            draw.ellipse([x, y, x+size, y+size], fill=color)
+        colors = [(255, 0, 255), (0, 255, 255), (255, 255, 0)]
+        return scatter_sprites(img, count, rng, colors)
+    
+    def enable_profiling(self, trace_allocations=True):
+        """Start recording per-stage timings; returns the RenderProfiler
         
-        return img
+        trace_allocations also records net traced allocations per stage,
+        at the cost of running tracemalloc.
+        """
+        if self.profiler is None:
+            self.profiler = RenderProfiler(trace_allocations)
+        return self.profiler
+    
+    def disable_profiling(self):
+        """Stop recording; returns the profiler with what it collected"""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.close()
+        return profiler
+    
+    def _stage(self, name):
+        """Profiler stage context, or a shared no-op when profiling is off"""
+        profiler = self.profiler
+        return _NOT_PROFILING if profiler is None else profiler.stage(name)
+    
+    def _rng(self, seed):
+        """Generator for one render: a fresh one when seeded, else the engine's"""
+        if seed is None:
+            return self.rng
+        return np.random.default_rng(seed)
+    
+    @staticmethod
+    def _choice(rng, options):
+        """rng.choice that keeps tuples and strings as plain Python objects"""
+        return options[int(rng.integers(len(options)))]
@@ -0,0 +1,231 @@
+"""
+CRT Buddy - Render Profiler
+Per-stage wall time and allocation tracking for MemeEngine renders
+"""
+from collections import deque
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+
+# Histogram bucket edges in ms (roughly 1-2-5 steps)
+HISTOGRAM_EDGES_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class _Span:
+    """Context manager timing one render or stage"""
+
+    __slots__ = ('profiler', 'name', 'record', 'start', 'alloc_start', 'peak', 'concurrency')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.record = self.profiler._open(self)
+        self.alloc_start = self.peak = self.profiler._allocated()
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        record = self.record
+        record['duration_ms'] = (end - self.start) * 1000
+        if self.alloc_start is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            record['alloc_kb'] = (current - self.alloc_start) / 1024
+            if self.profiler._ran_alone(self):
+                record['peak_kb'] = (self.peak - self.alloc_start) / 1024
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.profiler._close(self)
+        return False
+
+
+class RenderProfiler:
+    """Records how long each stage of each render took
+
+    engine.profiler.render('image_meme') wraps one render and
+    engine.profiler.stage('effect') one stage inside it. A render that
+    starts inside another render is recorded as a nested stage. Each
+    finished render is a dict:
+
+        {'name': 'image_meme', 'start_ms': ..., 'duration_ms': ...,
+         'thread': ..., 'stages': [{'name': 'decode', 'start_ms': ...,
+         'duration_ms': ..., 'depth': 0, 'alloc_kb': ...}, ...]}
+
+    With trace_allocations=True each entry also has alloc_kb, the net
+    change in memory traced by tracemalloc, and peak_kb, the highest
+    point above the starting level. Both count NumPy buffers and Python
+    objects, not Pillow's C-side image memory, and both are process-wide,
+    so alloc_kb also includes other threads' allocations. tracemalloc has
+    a single peak counter, which every span start resets, so peak_kb is
+    left out of any span that overlapped a span on another thread. The
+    last max_renders renders are kept.
+    """
+
+    def __init__(self, trace_allocations=True, max_renders=1000):
+        self.renders = deque(maxlen=max_renders)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._epoch = time.perf_counter()
+        self._started_tracing = False
+        # Threads with an open span, and a count of times a second thread
+        # joined in (which invalidates the peaks of everything open then)
+        self._active_threads = 0
+        self._overlaps = 0
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.trace_allocations = trace_allocations
+
+    def render(self, name):
+        """Context manager around one whole render"""
+        return _Span(self, name)
+
+    # Inside a render, a stage and a nested render are recorded the same way
+    stage = render
+
+    def close(self):
+        """Stop tracemalloc if this profiler started it"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def clear(self):
+        with self._lock:
+            self.renders.clear()
+
+    # ------------------------------------------------------------------
+    # Reports
+    # ------------------------------------------------------------------
+
+    def last(self):
+        """Most recent finished render, or None"""
+        with self._lock:
+            return self.renders[-1] if self.renders else None
+
+    def durations(self):
+        """{stage or render name: [duration_ms, ...]} over all kept renders"""
+        with self._lock:
+            renders = list(self.renders)
+        durations = {}
+        for render in renders:
+            durations.setdefault(render['name'], []).append(render['duration_ms'])
+            for stage in render['stages']:
+                durations.setdefault(stage['name'], []).append(stage['duration_ms'])
+        return durations
+
+    def summary(self, edges=HISTOGRAM_EDGES_MS):
+        """Per-name count, total/mean/p50/p95/max ms and a histogram
+
+        histogram['counts'][i] counts durations below edges[i] (and at or
+        above edges[i - 1]); the last count is everything >= edges[-1].
+        """
+        summary = {}
+        for name, values in self.durations().items():
+            values = np.asarray(values)
+            counts = np.bincount(np.searchsorted(edges, values, side='right'),
+                                 minlength=len(edges) + 1)
+            summary[name] = {
+                'count': len(values),
+                'total_ms': float(values.sum()),
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)),
+                'max_ms': float(values.max()),
+                'histogram': {'edges_ms': list(edges), 'counts': counts.tolist()},
+            }
+        return summary
+
+    def chrome_trace(self):
+        """Renders as Chrome trace events (chrome://tracing, Perfetto)"""
+        with self._lock:
+            renders = list(self.renders)
+        pid = os.getpid()
+        events = []
+        for render in renders:
+            for span, category in [(render, 'render')] + [(s, 'stage') for s in render['stages']]:
+                event = {
+                    'name': span['name'],
+                    'cat': category,
+                    'ph': 'X',
+                    'ts': span['start_ms'] * 1000,
+                    'dur': span['duration_ms'] * 1000,
+                    'pid': pid,
+                    'tid': render['thread'],
+                }
+                if 'alloc_kb' in span:
+                    event['args'] = {key: round(span[key], 1)
+                                     for key in ('alloc_kb', 'peak_kb') if key in span}
+                events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    # ------------------------------------------------------------------
+    # Span bookkeeping (per thread, so worker-thread renders do not mix)
+    # ------------------------------------------------------------------
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _open(self, span):
+        stack = self._stack()
+        with self._lock:
+            if not stack:
+                self._active_threads += 1
+                if self._active_threads > 1:
+                    self._overlaps += 1
+            span.concurrency = (self._active_threads == 1, self._overlaps)
+        record = {'name': span.name, 'start_ms': (time.perf_counter() - self._epoch) * 1000}
+        if stack:
+            record['depth'] = len(stack) - 1
+            stack[0].record['stages'].append(record)
+            if self._allocated() is not None:
+                # The child resets the peak; fold the parent's peak so far in first
+                parent = stack[-1]
+                parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+        else:
+            record['thread'] = threading.get_ident()
+            record['stages'] = []
+        if self._allocated() is not None:
+            tracemalloc.reset_peak()
+        stack.append(span)
+        return record
+
+    def _close(self, span):
+        stack = self._stack()
+        stack.pop()
+        if not stack:
+            with self._lock:
+                self._active_threads -= 1
+        if stack:
+            parent = stack[-1]
+            if span.peak is not None and parent.peak is not None:
+                parent.peak = max(parent.peak, span.peak)
+        else:
+            with self._lock:
+                self.renders.append(span.record)
+
+    def _ran_alone(self, span):
+        """No other thread had a span open at any point while span was open"""
+        alone, overlaps = span.concurrency
+        with self._lock:
+            return alone and overlaps == self._overlaps
+
+    def _allocated(self):
+        if not self.trace_allocations or not tracemalloc.is_tracing():
+            return None
+        return tracemalloc.get_traced_memory()[0]
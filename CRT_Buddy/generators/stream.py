@@ -0,0 +1,314 @@
+"""
+CRT Buddy - Stream Filter
+Real-time Y2K effects on video files, cameras or a synthetic test source
+
+Usage (from the CRT_Buddy directory):
+    python -m generators.stream clip.mp4 --effect crt -o clip_crt.mp4
+    python -m generators.stream --device 0 --effect vhs --preview
+    python -m generators.stream --synthetic --frames 300 --effect neon
+"""
+import argparse
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+from effects.realtime import RealtimeStyles
+
+try:
+    import cv2
+except ImportError:
+    # Only needed for files, cameras and output; the synthetic source and
+    # the filters themselves are pure NumPy
+    cv2 = None
+
+
+def _require_cv2(what):
+    if cv2 is None:
+        raise RuntimeError(f"OpenCV is required for {what}: pip install opencv-python")
+
+
+# ---------------------------------------------------------------------------
+# Sources: read() returns an RGB uint8 frame, or None when the stream ends
+# ---------------------------------------------------------------------------
+
+class SyntheticSource:
+    """Moving color bars and a bouncing box, no camera or codec needed
+
+    With realtime=True frames arrive at fps like a camera's; otherwise
+    they are produced on demand like a file's.
+    """
+
+    def __init__(self, size=(640, 480), fps=30, frames=None, realtime=False):
+        self.size = size
+        self.fps = fps
+        self.frames = frames
+        self.live = realtime
+        self._index = 0
+        self._next = None
+
+        width, height = size
+        bars = np.array([(255, 255, 255), (255, 255, 0), (0, 255, 255), (0, 255, 0),
+                         (255, 0, 255), (255, 0, 0), (0, 0, 255), (0, 0, 0)], dtype=np.uint8)
+        columns = bars[np.arange(width) * len(bars) // width]
+        self._bars = np.broadcast_to(columns, (height, width, 3))
+
+    def read(self):
+        if self.frames is not None and self._index >= self.frames:
+            return None
+        if self.live:
+            # Wait for the next frame slot
+            now = time.perf_counter()
+            self._next = max(self._next or now, now - 1.0 / self.fps)
+            time.sleep(max(0.0, self._next - now))
+            self._next += 1.0 / self.fps
+        width, height = self.size
+        t = self._index
+        self._index += 1
+
+        frame = np.roll(self._bars, t * 4, axis=1)
+        box = max(8, min(width, height) // 6)
+        x = abs((t * 7) % (2 * (width - box)) - (width - box))
+        y = abs((t * 5) % (2 * (height - box)) - (height - box))
+        frame[y:y + box, x:x + box] = (t * 3) % 256
+        return frame
+
+    def close(self):
+        pass
+
+
+class VideoSource:
+    """A video file, stream URL or capture device through OpenCV"""
+
+    def __init__(self, source, size=None):
+        _require_cv2("video input")
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open video source: {source}")
+        # Devices and network streams (rtsp://, http://, ...) deliver frames in
+        # real time; files can be read as fast as we like. Streams without a
+        # known frame count are treated as live too.
+        self.live = (isinstance(source, int) or _is_stream_url(source)
+                     or self.capture.get(cv2.CAP_PROP_FRAME_COUNT) <= 0)
+        if size and self.live:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30
+        self.size = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def read(self):
+        ok, frame = self.capture.read()
+        if not ok:
+            return None
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        self.capture.release()
+
+
+def _is_stream_url(source):
+    scheme, sep, _ = str(source).partition('://')
+    return bool(sep) and scheme.lower() != 'file'
+
+
+# ---------------------------------------------------------------------------
+# Sinks: write() takes an RGB uint8 frame and returns False to stop
+# ---------------------------------------------------------------------------
+
+class VideoSink:
+    """Encode filtered frames to a video file"""
+
+    def __init__(self, path, fps, size, fourcc='mp4v'):
+        _require_cv2("video output")
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if not self.writer.isOpened():
+            raise RuntimeError(f"Cannot write video: {path}")
+
+    def write(self, frame):
+        self.writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        return True
+
+    def close(self):
+        self.writer.release()
+
+
+class PreviewSink:
+    """Live preview window; press q or Esc to stop"""
+
+    def __init__(self, title="CRT Buddy"):
+        _require_cv2("the preview window")
+        self.title = title
+
+    def write(self, frame):
+        cv2.imshow(self.title, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        return (cv2.waitKey(1) & 0xFF) not in (ord('q'), 27)
+
+    def close(self):
+        cv2.destroyWindow(self.title)
+
+
+# ---------------------------------------------------------------------------
+# Frame loop
+# ---------------------------------------------------------------------------
+
+class FrameReader(threading.Thread):
+    """Reads frames ahead of the filter into a small bounded queue
+
+    The queue holds at most `depth` frames, so the filter works on one
+    frame while the next is being captured (double buffering). For live
+    sources a full queue drops its oldest frame, so latency stays bounded
+    at `depth` frames when filtering falls behind; files block instead so
+    no frame is lost.
+    """
+
+    def __init__(self, source, depth=2):
+        super().__init__(daemon=True)
+        self.source = source
+        self.frames = queue.Queue(maxsize=depth)
+        self.dropped = 0
+        self._stopping = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopping.is_set():
+                frame = self.source.read()
+                if frame is None:
+                    break
+                if self.source.live:
+                    self._put_latest(frame)
+                else:
+                    self._put(frame)
+        finally:
+            # End marker
+            self._put(None)
+
+    def _put(self, frame):
+        """Wait for room (gives up once stopped)"""
+        while not self._stopping.is_set():
+            try:
+                self.frames.put(frame, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _put_latest(self, frame):
+        """Queue frame, dropping the oldest queued one if full"""
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self):
+        return self.frames.get()
+
+    def stop(self):
+        self._stopping.set()
+
+
+def run_stream(source, effect='crt', sink=None, max_frames=None, seed=None):
+    """Filter frames from source into sink until either ends
+
+    Returns stats: frames filtered, frames dropped by the reader, wall
+    clock fps and mean filter time per frame in ms.
+    """
+    styles = RealtimeStyles(seed)
+    reader = FrameReader(source)
+    reader.start()
+
+    count = 0
+    filter_time = 0.0
+    start = time.perf_counter()
+    try:
+        while max_frames is None or count < max_frames:
+            frame = reader.get()
+            if frame is None:
+                break
+            t0 = time.perf_counter()
+            out = styles.apply(frame, effect)
+            filter_time += time.perf_counter() - t0
+            count += 1
+            if sink is not None and not sink.write(out):
+                break
+    finally:
+        elapsed = time.perf_counter() - start
+        # Let the reader leave source.read() before releasing the source
+        reader.stop()
+        reader.join(timeout=1.0)
+        source.close()
+        if sink is not None:
+            sink.close()
+
+    return {
+        'frames': count,
+        'dropped': reader.dropped,
+        'fps': count / elapsed if elapsed else 0.0,
+        'filter_ms': filter_time / count * 1000 if count else 0.0,
+    }
+
+
+def parse_size(value):
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    return width, height
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m generators.stream',
+        description='Apply Y2K effects to video in real time.',
+    )
+    parser.add_argument('input', nargs='?', help='video file or stream URL')
+    parser.add_argument('--device', type=int,
+                        help='capture device index, e.g. 0 for /dev/video0')
+    parser.add_argument('--synthetic', action='store_true',
+                        help='use the built-in test pattern instead of a video')
+    parser.add_argument('--realtime', action='store_true',
+                        help='deliver synthetic frames at 30 fps like a camera')
+    parser.add_argument('--effect', default='crt', choices=RealtimeStyles.EFFECTS,
+                        help='effect to apply (default: crt)')
+    parser.add_argument('--size', type=parse_size, default=(640, 480),
+                        help='synthetic / camera frame size (default: 640x480)')
+    parser.add_argument('--frames', type=int, help='stop after this many frames')
+    parser.add_argument('--output', '-o', help='write the filtered video here')
+    parser.add_argument('--preview', action='store_true', help='show a live preview window')
+    parser.add_argument('--seed', type=int, help='seed for the VHS randomness')
+    args = parser.parse_args(argv)
+
+    sources = [args.input is not None, args.device is not None, args.synthetic]
+    if sum(sources) != 1:
+        parser.error('give exactly one of: input, --device, --synthetic')
+
+    try:
+        if args.synthetic:
+            source = SyntheticSource(args.size, frames=args.frames, realtime=args.realtime)
+        else:
+            source = VideoSource(args.input if args.device is None else args.device, args.size)
+
+        sink = None
+        if args.output:
+            sink = VideoSink(args.output, source.fps, source.size)
+        elif args.preview:
+            sink = PreviewSink()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    stats = run_stream(source, args.effect, sink, args.frames, args.seed)
+    print(f"{stats['frames']} frames at {stats['fps']:.1f} fps "
+          f"({stats['filter_ms']:.1f} ms/frame filtering, {stats['dropped']} dropped)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
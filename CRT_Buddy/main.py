@@ -8,6 +8,7 @@ from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtCore import QTimer
 from PyQt6.QtGui import QIcon
 from core.pet_window_v6 import CRTBuddyWindow
+from core.render_worker import RenderQueue
 from generators.meme_engine import MemeEngine
 
 
@@ -19,6 +20,7 @@ class CRTBuddyApp:
         self.app.setApplicationName("CRT Buddy")
         
         self.meme_engine = MemeEngine(output_dir="output")
+        self.renderer = RenderQueue()
         self.window = CRTBuddyWindow()
         self.setup_connections()
         
@@ -29,6 +31,11 @@ class CRTBuddyApp:
         self.window.image_dropped.connect(self.handle_image_drop)
         self.window.generate_btn.clicked.connect(self.handle_generate)
         self.window.effect_btn.clicked.connect(self.handle_random_effect)
+        
+        # Renders run on the worker; results come back on the GUI thread
+        self.renderer.progress.connect(self.on_render_progress)
+        self.renderer.finished.connect(self.on_render_finished)
+        self.renderer.failed.connect(self.on_render_failed)
     
     def show_welcome(self):
         """Show welcome message"""
@@ -44,36 +51,21 @@ class CRTBuddyApp:
         self.window.set_mood("processing")
         self.window.set_status("PROCESSING IMAGE...")
         
-        QTimer.singleShot(500, lambda: self.process_image(image_path))
+        # A newer drop supersedes any image still rendering
+        self.process_image(image_path)
     
     def process_image(self, image_path):
-        """Process image and apply effects"""
-        try:
-            text = self.window.get_input_text()
-            
-            result_img = self.meme_engine.generate_image_meme(
-                image_path, 
+        """Process image and apply effects on the render worker"""
+        text = self.window.get_input_text()
+        
+        self.renderer.submit("image", [
+            ("APPLYING Y2K EFFECT...", lambda _: self.meme_engine.generate_image_meme(
+                image_path,
                 text=text,
                 effect='random'
-            )
-            
-            if result_img:
-                output_path = self.meme_engine.save_meme(result_img, "y2k_image")
-                
-                if output_path:
-                    self.window.set_mood("happy")
-                    self.window.set_status(f"SAVED: {os.path.basename(output_path)}")
-                    QTimer.singleShot(2000, self.show_success_message)
-                else:
-                    self.window.set_status("Failed to save meme")
-            else:
-                self.window.set_status("Failed to process image")
-                self.window.set_mood("idle")
-                
-        except Exception as e:
-            print(f"Error processing image: {e}")
-            self.window.set_status(f"ERROR: {str(e)}")
-            self.window.set_mood("idle")
+            )),
+            ("SAVING...", lambda img: self.meme_engine.save_meme(img, "y2k_image")),
+        ], supersede=True)
     
     def handle_generate(self):
         """Handle generate meme button"""
@@ -86,64 +78,56 @@ class CRTBuddyApp:
         self.window.set_mood("processing")
         self.window.set_status("GENERATING Y2K MEME...")
         
-        QTimer.singleShot(500, lambda: self.generate_text_meme(text))
+        self.generate_text_meme(text)
     
     def generate_text_meme(self, text):
-        """Generate text meme"""
-        try:
-            result_img = self.meme_engine.generate_text_meme(text, style='random')
-            
-            if result_img:
-                output_path = self.meme_engine.save_meme(result_img, "y2k_text")
-                
-                if output_path:
-                    self.window.set_mood("happy")
-                    self.window.set_status(f"SAVED: {os.path.basename(output_path)}")
-                    self.window.clear_input()
-                    
-                    QTimer.singleShot(2000, self.show_success_message)
-                else:
-                    self.window.set_status("Failed to save meme")
-            else:
-                self.window.set_status("Failed to generate meme")
-                
-        except Exception as e:
-            print(f"Error generating text meme: {e}")
-            self.window.set_status(f"ERROR: {str(e)}")
-        
-        finally:
-            QTimer.singleShot(3000, lambda: self.window.set_mood("idle"))
+        """Generate text meme on the render worker"""
+        self.renderer.submit("text", [
+            ("GENERATING Y2K MEME...", lambda _: self.meme_engine.generate_text_meme(
+                text, style='random'
+            )),
+            ("SAVING...", lambda img: self.meme_engine.save_meme(img, "y2k_text")),
+        ])
     
     def handle_random_effect(self):
         """Handle random effect button"""
         self.window.set_mood("processing")
         self.window.set_status("GENERATING RANDOM Y2K MAGIC...")
         
-        QTimer.singleShot(500, self.generate_random_meme)
+        self.generate_random_meme()
     
     def generate_random_meme(self):
-        """Generate completely random meme"""
-        try:
-            result_img = self.meme_engine.generate_random_meme()
-            
-            if result_img:
-                output_path = self.meme_engine.save_meme(result_img, "y2k_random")
-                
-                if output_path:
-                    self.window.set_mood("happy")
-                    self.window.set_status(f"SAVED: {os.path.basename(output_path)}")
-                    
-                    QTimer.singleShot(2000, self.show_success_message)
-                else:
-                    self.window.set_status("Failed to save meme")
-            else:
-                self.window.set_status("Failed to generate meme")
-                
-        except Exception as e:
-            print(f"Error generating random meme: {e}")
-            self.window.set_status(f"ERROR: {str(e)}")
+        """Generate completely random meme on the render worker"""
+        self.renderer.submit("random", [
+            ("GENERATING RANDOM Y2K MAGIC...", lambda _: self.meme_engine.generate_random_meme()),
+            ("SAVING...", lambda img: self.meme_engine.save_meme(img, "y2k_random")),
+        ])
+    
+    def on_render_progress(self, channel, status):
+        """Render worker progress"""
+        self.window.set_mood("processing")
+        self.window.set_status(status)
+    
+    def on_render_finished(self, channel, output_path):
+        """Render worker saved a meme"""
+        if output_path:
+            self.window.set_mood("happy")
+            self.window.set_status(f"SAVED: {os.path.basename(output_path)}")
+            if channel == "text":
+                self.window.clear_input()
+            QTimer.singleShot(2000, self.show_success_message)
+        else:
+            self.window.set_status("Failed to save meme")
         
-        finally:
+        if channel != "image":
+            QTimer.singleShot(3000, lambda: self.window.set_mood("idle"))
+    
+    def on_render_failed(self, channel, message):
+        """Render worker raised"""
+        self.window.set_status(f"ERROR: {message}")
+        if channel == "image":
+            self.window.set_mood("idle")
+        else:
             QTimer.singleShot(3000, lambda: self.window.set_mood("idle"))
     
     def show_success_message(self):
@@ -156,7 +140,9 @@ class CRTBuddyApp:
     def run(self):
         """Run application"""
         self.window.show()
-        return self.app.exec()
+        code = self.app.exec()
+        self.renderer.wait()
+        return code
 
 
 def main():
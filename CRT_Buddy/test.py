@@ -1,15 +1,15 @@
 # -*- coding: utf-8 -*-
 """
 CRT Buddy - Test Script
-Ըģ鹦
+测试各个模块功能
 """
 import os
 import sys
 
 def test_imports():
-    """ģ鵼"""
+    """测试模块导入"""
     print("=" * 60)
-    print("  ģ鵼")
+    print("  测试模块导入")
     print("=" * 60)
     
     modules = [
@@ -31,36 +31,38 @@ def test_imports():
     
     print("\n" + "=" * 60)
     if all_passed:
-        print("? ģ")
+        print("? 所有依赖模块正常")
     else:
-        print("? ģȱʧ: pip install -r requirements.txt")
+        print("? 部分模块缺失，请运行: pip install -r requirements.txt")
     print("=" * 60 + "\n")
     
     return all_passed
 
 
 def test_effects():
-    """Ч"""
+    """测试特效功能"""
     print("=" * 60)
-    print("  Y2KЧ")
+    print("  测试Y2K特效")
     print("=" * 60)
     
     try:
         from PIL import Image
-        from effects.y2k_styles import Y2KEffects
+        from effects.y2k_styles import Y2KStyles
         
-        # ͼ
+        styles = Y2KStyles()
+        
+        # 创建测试图像
         test_img = Image.new('RGB', (400, 300), '#0066cc')
-        print("? ͼ")
+        print("? 创建测试图像")
         
-        # ԸЧ
+        # 测试各种特效
         effects_to_test = [
-            ("CRTЧ", Y2KEffects.apply_crt_effect),
-            ("VHS", Y2KEffects.apply_vhs_glitch),
-            ("ȫϢЧ", Y2KEffects.apply_holographic_effect),
-            ("ƸЧ", Y2KEffects.apply_chrome_effect),
-            ("޺Թ", Y2KEffects.apply_neon_glow),
-            ("ػ", lambda img: Y2KEffects.apply_pixelate(img, 8)),
+            ("CRT效果", styles.crt_effect),
+            ("VHS故障", styles.vhs_effect),
+            ("全息效果", styles.holographic_effect),
+            ("镀铬效果", styles.chrome_effect),
+            ("霓虹辉光", styles.neon_effect),
+            ("像素化", styles.pixelate_effect),
         ]
         
         for name, effect_func in effects_to_test:
@@ -71,32 +73,122 @@ def test_effects():
                 print(f"? {name:15s} - FAILED: {e}")
         
         print("\n" + "=" * 60)
-        print("? Ч")
+        print("? 特效测试完成")
         print("=" * 60 + "\n")
         return True
         
     except Exception as e:
-        print(f"? Чʧ: {e}\n")
+        print(f"? 特效测试失败: {e}\n")
+        return False
+
+
+def test_tiled_effects():
+    """测试分块处理与整帧处理结果完全一致"""
+    print("=" * 60)
+    print("  测试分块特效")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        from PIL import Image
+        from effects.y2k_styles import Y2KStyles
+        
+        # 高度不是分块高度的整数倍，检查边界和光晕行
+        rng = np.random.default_rng(2)
+        img = Image.fromarray(rng.integers(0, 256, (301, 257, 3)).astype(np.uint8))
+        
+        passed = True
+        chains = [[name] for name in Y2KStyles.EFFECTS] + [['vhs', 'crt'], ['vhs', 'chrome']]
+        for chain in chains:
+            label = '+'.join(chain)
+            whole = Y2KStyles(seed=5).pipeline(chain)
+            tiled = Y2KStyles(seed=5).pipeline(chain)
+            if not whole.tileable:
+                try:
+                    tiled.run_tiled(img, tile_height=37)
+                    ok = False
+                except ValueError:
+                    ok = True
+                passed = passed and ok
+                print(f"{'?' if ok else '?'} {label:12s} - 拒绝分块")
+                continue
+            diff = np.abs(np.asarray(whole.run(img), dtype=np.int16)
+                          - np.asarray(tiled.run_tiled(img, tile_height=37), dtype=np.int16)).max()
+            ok = diff == 0
+            passed = passed and ok
+            print(f"{'?' if ok else '?'} {label:12s} - 最大差异 {diff}")
+        
+        print("\n" + "=" * 60)
+        print("? 分块特效测试完成")
+        print("=" * 60 + "\n")
+        return passed
+        
+    except Exception as e:
+        print(f"? 分块特效测试失败: {e}\n")
+        return False
+
+
+def test_realtime_effects():
+    """测试实时特效与静态特效一致（含饱和输入）"""
+    print("=" * 60)
+    print("  测试实时特效")
+    print("=" * 60)
+    
+    try:
+        import numpy as np
+        from PIL import Image
+        from effects.y2k_styles import Y2KStyles
+        from effects.realtime import RealtimeStyles
+        
+        # 随机帧 + 饱和帧（白底密集黑点，检查整数溢出）
+        rng = np.random.default_rng(1)
+        noise = rng.integers(0, 256, (240, 320, 3)).astype(np.uint8)
+        mesh = np.full((240, 320, 3), 255, dtype=np.uint8)
+        mesh[::2, ::2] = 0
+        
+        # 允许的平均误差（单位：色阶）；neon 的辉光在1/4分辨率下模糊
+        limits = {'crt': 1.0, 'holographic': 1.0, 'chrome': 1.0, 'neon': 1.5}
+        
+        passed = True
+        for frame_name, frame in (("随机", noise), ("饱和", mesh)):
+            for name, limit in limits.items():
+                fast = RealtimeStyles(seed=0).apply(frame, name).astype(np.int16)
+                still = Y2KStyles(seed=0).apply_effect(Image.fromarray(frame), name)
+                error = np.abs(fast - np.asarray(still, dtype=np.int16)).mean()
+                ok = error < limit
+                passed = passed and ok
+                print(f"{'?' if ok else '?'} {name:12s} {frame_name} - 平均误差 {error:.2f}")
+        
+        print("\n" + "=" * 60)
+        print("? 实时特效测试完成")
+        print("=" * 60 + "\n")
+        return passed
+        
+    except Exception as e:
+        print(f"? 实时特效测试失败: {e}\n")
         return False
 
 
 def test_text_effects():
-    """Ч"""
+    """测试文字特效"""
     print("=" * 60)
-    print("  Ч")
+    print("  测试文字特效")
     print("=" * 60)
     
     try:
+        from PIL import Image
         from effects.text_effects import TextEffects
         
+        text_effects = TextEffects()
+        test_img = Image.new('RGB', (400, 300), '#000033')
         test_text = "Y2K TEST"
         
         effects_to_test = [
-            ("", lambda: TextEffects.create_gradient_text(test_text)),
-            ("", lambda: TextEffects.create_glitch_text(test_text)),
-            ("޺", lambda: TextEffects.create_neon_text(test_text)),
-            ("Ƹ", lambda: TextEffects.create_chrome_text(test_text)),
-            ("", lambda: TextEffects.create_retro_text(test_text)),
+            ("渐变文字", lambda: text_effects.gradient_text(test_img.copy(), test_text)),
+            ("故障文字", lambda: text_effects.glitch_text(test_img.copy(), test_text)),
+            ("霓虹文字", lambda: text_effects.neon_text(test_img.copy(), test_text)),
+            ("镀铬文字", lambda: text_effects.chrome_text(test_img.copy(), test_text)),
+            ("复古文字", lambda: text_effects.retro_text(test_img.copy(), test_text)),
         ]
         
         for name, effect_func in effects_to_test:
@@ -107,93 +199,211 @@ def test_text_effects():
                 print(f"? {name:15s} - FAILED: {e}")
         
         print("\n" + "=" * 60)
-        print("? Ч")
+        print("? 文字特效测试完成")
         print("=" * 60 + "\n")
         return True
         
     except Exception as e:
-        print(f"? Чʧ: {e}\n")
+        print(f"? 文字特效测试失败: {e}\n")
         return False
 
 
 def test_meme_engine():
-    """Meme"""
+    """测试Meme引擎"""
     print("=" * 60)
-    print("  Meme")
+    print("  测试Meme生成引擎")
     print("=" * 60)
     
     try:
         from generators.meme_engine import MemeEngine
         
         engine = MemeEngine(output_dir="test_output")
-        print("? Memeʼ")
+        print("? Meme引擎初始化")
         
-        # Meme
+        # 测试文字Meme生成
         try:
             text_meme = engine.generate_text_meme("TEST MEME", style='gradient')
-            print("? Meme")
+            print("? 文字Meme生成")
         except Exception as e:
-            print(f"? Memeʧ: {e}")
+            print(f"? 文字Meme生成失败: {e}")
         
-        # Meme
+        # 测试随机Meme
         try:
             random_meme = engine.generate_random_meme()
-            print("? Meme")
+            print("? 随机Meme生成")
         except Exception as e:
-            print(f"? Memeʧ: {e}")
+            print(f"? 随机Meme生成失败: {e}")
         
         print("\n" + "=" * 60)
-        print("? Meme")
+        print("? Meme引擎测试完成")
         print("=" * 60 + "\n")
         return True
         
     except Exception as e:
-        print(f"? Memeʧ: {e}\n")
+        print(f"? Meme引擎测试失败: {e}\n")
         return False
 
 
+def test_ai_resilience():
+    """测试AI客户端重试/熔断（本地桩HTTP服务器，不访问网络）"""
+    print("=" * 60)
+    print("  测试AI重试与熔断")
+    print("=" * 60)
+    
+    server = None
+    try:
+        import base64
+        import json
+        import random
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from ai.client import AIClient, AIConfig
+        from ai.resilience import Resilience
+        
+        # 每个路径一个待返回的 (状态码, 头) 队列，空队列返回 200
+        plan = {"/v1/chat/completions": [], "/v1/images/generations": []}
+        calls = {path: 0 for path in plan}
+        
+        class StubHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                calls[self.path] += 1
+                status, headers = plan[self.path].pop(0) if plan[self.path] else (200, {})
+                if status != 200:
+                    body = {"error": {"message": f"stub {status}"}}
+                elif self.path.endswith("/images/generations"):
+                    body = {"data": [{"b64_json": base64.b64encode(b"image").decode()}]}
+                else:
+                    body = {"choices": [{"message": {"content": "ok"}}]}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        
+        config = AIConfig(api_key="test", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+        config.image_provider = "openai"
+        config.cache_enabled = False
+        
+        # 假时钟和假sleep，测试瞬间完成
+        slept = []
+        now = [0.0]
+        resilience = Resilience(max_attempts=3, failure_threshold=2, reset_timeout=30,
+                                sleep=slept.append, clock=lambda: now[0], rng=random.Random(1))
+        client = AIClient(config, resilience=resilience)
+        messages = [{"role": "user", "content": "hi"}]
+        chat_path = "/v1/chat/completions"
+        
+        def check(name, ok):
+            print(f"{'?' if ok else '?'} {name}")
+            return ok
+        
+        passed = True
+        
+        # 503 和 429 重试，遵守 Retry-After
+        plan[chat_path][:] = [(503, {}), (429, {"Retry-After": "2"})]
+        reply = client.chat(messages)
+        passed &= check("503/429 重试后成功",
+                        reply == "ok" and calls[chat_path] == 3 and len(slept) == 2 and slept[1] == 2.0)
+        
+        # 4xx 不重试
+        calls[chat_path] = 0
+        plan[chat_path][:] = [(400, {})]
+        reply = client.chat(messages)
+        passed &= check("400 不重试",
+                        reply is None and calls[chat_path] == 1 and client.last_error.status == 400)
+        
+        # 连续 5xx 打开熔断器，之后直接拒绝
+        calls[chat_path] = 0
+        plan[chat_path][:] = [(500, {})] * 2
+        client.chat(messages)
+        reply = client.chat(messages)
+        passed &= check("5xx 打开熔断器",
+                        reply is None and calls[chat_path] == 2 and client.last_error.kind == "circuit_open")
+        
+        # 熔断只针对聊天接口，同一主机的生图不受影响
+        image = client.generate_image("test")
+        passed &= check("生图不受聊天熔断影响", image == b"image")
+        
+        # 冷却后试探请求成功，熔断器恢复
+        now[0] += 31
+        calls[chat_path] = 0
+        reply = client.chat(messages)
+        passed &= check("冷却后恢复",
+                        reply == "ok" and calls[chat_path] == 1 and client.chat(messages) == "ok")
+        
+        client.close()
+        
+        print("\n" + "=" * 60)
+        print("? AI重试与熔断测试完成")
+        print("=" * 60 + "\n")
+        return bool(passed)
+        
+    except Exception as e:
+        print(f"? AI重试与熔断测试失败: {e}\n")
+        return False
+    
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
 def test_pet_window():
-    """Գﴰڣԣ"""
+    """测试宠物窗口（仅导入测试）"""
     print("=" * 60)
-    print("  Գﴰģ")
+    print("  测试宠物窗口模块")
     print("=" * 60)
     
     try:
         from core.pet_window import CRTBuddyWindow
-        print("? ﴰģ鵼ɹ")
-        print("   (ʾҪ)")
+        print("? 宠物窗口模块导入成功")
+        print("   (窗口显示需要运行主程序)")
         
         print("\n" + "=" * 60)
-        print("? ﴰڲ")
+        print("? 宠物窗口测试完成")
         print("=" * 60 + "\n")
         return True
         
     except Exception as e:
-        print(f"? ﴰڲʧ: {e}\n")
+        print(f"? 宠物窗口测试失败: {e}\n")
         return False
 
 
 def main():
-    """Ժ"""
+    """主测试函数"""
     print("\n")
     print("*" * 60)
-    print("  CRT BUDDY - ģ")
+    print("  CRT BUDDY - 模块测试")
     print("*" * 60)
     print("\n")
     
     results = []
     
-    # и
-    results.append(("", test_imports()))
-    results.append(("ͼЧ", test_effects()))
-    results.append(("Ч", test_text_effects()))
-    results.append(("Meme", test_meme_engine()))
-    results.append(("ﴰ", test_pet_window()))
+    # 运行各项测试
+    results.append(("依赖导入", test_imports()))
+    results.append(("图像特效", test_effects()))
+    results.append(("分块特效", test_tiled_effects()))
+    results.append(("实时特效", test_realtime_effects()))
+    results.append(("文字特效", test_text_effects()))
+    results.append(("Meme引擎", test_meme_engine()))
+    results.append(("AI重试熔断", test_ai_resilience()))
+    results.append(("宠物窗口", test_pet_window()))
     
-    # ܽ
+    # 汇总结果
     print("\n")
     print("*" * 60)
-    print("  Խ")
+    print("  测试结果汇总")
     print("*" * 60)
     
     all_passed = True
@@ -206,11 +416,11 @@ def main():
     print("*" * 60)
     
     if all_passed:
-        print("\n?? вͨˣ")
+        print("\n?? 所有测试通过！可以运行主程序了：")
         print("   python CRT_Buddy.py")
-        print("   ˫ run.bat\n")
+        print("   或双击 run.bat\n")
     else:
-        print("\n??  ֲʧܣװ")
+        print("\n??  部分测试失败，请检查依赖安装：")
         print("   pip install -r requirements.txt\n")
     
     return all_passed
@@ -218,6 +428,6 @@ def main():
 
 if __name__ == "__main__":
     success = main()
-    print("\n˳...")
+    print("\n按任意键退出...")
     input()
     sys.exit(0 if success else 1)